@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable
+
+import transform_legacy_proposals as transform
+from generate_legacy_workbook import build_workbook
+from transform_legacy_proposals import (
+    WORKBOOK_ENGINES,
+    extract_records,
+    plan_extraction,
+    plan_sql_batches,
+    write_customers_csv,
+    write_proposals_csv,
+    write_revisions_csv,
+    write_sql,
+)
+
+
+def parse_scales(value: str) -> list[tuple[int, int]]:
+    """Parses "SHEETSxROWS,..." such as "5x200,20x500"."""
+    scales: list[tuple[int, int]] = []
+    for item in value.split(","):
+        sheets, _, rows = item.strip().partition("x")
+        try:
+            scales.append((int(sheets), int(rows)))
+        except ValueError:
+            raise SystemExit(f"Invalid scale {item!r}; expected SHEETSxROWS") from None
+    return scales
+
+
+def best_of(repeat: int, run: Callable[[], object]) -> float:
+    timings: list[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def benchmark_scale(
+    workdir: Path,
+    sheets: int,
+    rows: int,
+    *,
+    engine: str,
+    workers: int,
+    messiness: float,
+    repeat: int,
+    seed: int,
+) -> list[tuple[str, float, int, str]]:
+    xlsx_path = build_workbook(
+        workdir / f"legacy-{sheets}x{rows}.xlsx",
+        sheets=sheets,
+        rows=rows,
+        messiness=messiness,
+        seed=seed,
+    )
+    output_dir = workdir / f"out-{sheets}x{rows}"
+    output_dir.mkdir(exist_ok=True)
+    customers_csv = output_dir / "customers_legacy.csv"
+    proposals_csv = output_dir / "proposals_legacy.csv"
+    revisions_csv = output_dir / "proposal_revisions_legacy.csv"
+
+    customers, tasks = plan_extraction([xlsx_path], engine=engine)
+
+    def extract() -> list[transform.SheetResult]:
+        # Fresh parser and mapping caches, so every run pays what a real run pays.
+        transform.VALUE_PARSER = transform.ValueParser()
+        transform.SHEET_MAPPINGS = transform.MappingCache()
+        return [result for _, result in extract_records(tasks, workers=workers)]
+
+    results = extract()
+    proposals = [proposal for result in results for proposal in result.proposals]
+    revisions = [revision for result in results for revision in result.revisions]
+    write_customers_csv(customers_csv, customers)
+    write_proposals_csv(proposals_csv, proposals)
+    write_revisions_csv(revisions_csv, revisions)
+    batches = plan_sql_batches(
+        customers, Counter(proposal.customer_slug for proposal in proposals), 1000
+    )
+
+    records = len(proposals) + len(revisions)
+    sql_files = (customers_csv, proposals_csv, revisions_csv)
+    sql_file = output_dir / "import_legacy.sql"
+    batched_sql_file = output_dir / "import_batched.sql"
+    # The scripts only reference the CSVs, so their cost is measured in bytes, not records.
+    write_sql(sql_file, *sql_files)
+    write_sql(batched_sql_file, *sql_files, batches=batches)
+    # (stage, run, amount processed per run, unit of that amount)
+    stages: list[tuple[str, Callable[[], object], int, str]] = [
+        (
+            "plan_extraction",
+            lambda: plan_extraction([xlsx_path], engine=engine),
+            len(tasks),
+            "sheets",
+        ),
+        ("extract_records", extract, records, "records"),
+        (
+            "write_customers_csv",
+            lambda: write_customers_csv(customers_csv, customers),
+            len(customers),
+            "rows",
+        ),
+        (
+            "write_proposals_csv",
+            lambda: write_proposals_csv(proposals_csv, proposals),
+            len(proposals),
+            "rows",
+        ),
+        (
+            "write_revisions_csv",
+            lambda: write_revisions_csv(revisions_csv, revisions),
+            len(revisions),
+            "rows",
+        ),
+        ("write_sql", lambda: write_sql(sql_file, *sql_files), sql_file.stat().st_size, "bytes"),
+        (
+            "write_sql (batched)",
+            lambda: write_sql(batched_sql_file, *sql_files, batches=batches),
+            batched_sql_file.stat().st_size,
+            "bytes",
+        ),
+    ]
+    return [(name, best_of(repeat, run), count, unit) for name, run, count, unit in stages]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Times each stage of transform_legacy_proposals.py on synthetic workbooks "
+            "of several sizes."
+        )
+    )
+    parser.add_argument(
+        "--scales",
+        default="5x200,20x500,60x1000",
+        help="Comma-separated SHEETSxROWS workbook sizes (default: 5x200,20x500,60x1000)",
+    )
+    parser.add_argument("--engine", choices=WORKBOOK_ENGINES, default="xml")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--messiness", type=float, default=0.1, help="See generate_legacy_workbook.py"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Timed runs per stage, best is kept (default: 3)"
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--workdir",
+        help="Keep the generated workbooks and outputs here instead of a temporary directory",
+    )
+    args = parser.parse_args()
+
+    scales = parse_scales(args.scales)
+    with tempfile.TemporaryDirectory(prefix="legacy-bench-") as temp_dir:
+        workdir = Path(args.workdir).expanduser() if args.workdir else Path(temp_dir)
+        workdir.mkdir(parents=True, exist_ok=True)
+
+        print(f"engine={args.engine} workers={args.workers} best of {args.repeat}")
+        print(f"{'scale':<10} {'stage':<22} {'seconds':>9} {'amount':>9} {'unit':<8} {'per s':>13}")
+        for sheets, rows in scales:
+            timings = benchmark_scale(
+                workdir,
+                sheets,
+                rows,
+                engine=args.engine,
+                workers=args.workers,
+                messiness=args.messiness,
+                repeat=args.repeat,
+                seed=args.seed,
+            )
+            scale = f"{sheets}x{rows}"
+            for stage, seconds, count, unit in timings:
+                rate = count / seconds if seconds else float("inf")
+                print(
+                    f"{scale:<10} {stage:<22} {seconds:>9.4f} {count:>9} {unit:<8} {rate:>13,.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import random
+import timeit
+from datetime import datetime
+
+from transform_legacy_proposals import ValueParser, parse_date_value, parse_decimal
+
+
+def build_samples(count: int, distinct: int, seed: int) -> dict[str, list[object]]:
+    """Raw cell values shaped like the legacy workbooks: few distinct values, many repeats."""
+    rng = random.Random(seed)
+    money_pool: list[object] = []
+    for _ in range(distinct):
+        cents = rng.randint(100_000, 90_000_000)
+        integer, fraction = divmod(cents, 100)
+        money_pool.extend(
+            [
+                cents / 100,
+                integer,
+                f"R$ {integer:,}".replace(",", ".") + f",{fraction:02d}",
+                f"{integer}.{fraction:02d}",
+                f"{integer:,}.{fraction:02d}",
+                "-",
+            ]
+        )
+
+    date_pool: list[object] = []
+    for _ in range(distinct):
+        moment = datetime(rng.randint(2018, 2024), rng.randint(1, 12), rng.randint(1, 28))
+        date_pool.extend(
+            [
+                moment,
+                rng.randint(43_000, 45_500),
+                rng.randint(43_000, 45_500) + 0.5,
+                moment.strftime("%d/%m/%Y"),
+                moment.strftime("%m/%d/%Y"),
+                moment.strftime("%Y-%m-%d"),
+                "n/d",
+            ]
+        )
+
+    return {
+        "decimal": [rng.choice(money_pool) for _ in range(count)],
+        "date": [rng.choice(date_pool) for _ in range(count)],
+    }
+
+
+def check_equivalence(samples: dict[str, list[object]]) -> None:
+    parser = ValueParser()
+    for value in samples["decimal"]:
+        expected = parse_decimal(value)
+        actual = parser.parse_decimal(value)
+        if str(expected) != str(actual):
+            raise SystemExit(f"decimal mismatch for {value!r}: {expected!r} != {actual!r}")
+    for value in samples["date"]:
+        for allow_excel_serial in (True, False):
+            expected = parse_date_value(value, allow_excel_serial=allow_excel_serial)
+            actual = parser.parse_date(value, allow_excel_serial=allow_excel_serial)
+            if expected != actual:
+                raise SystemExit(f"date mismatch for {value!r}: {expected!r} != {actual!r}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Microbenchmarks ValueParser against parse_decimal and parse_date_value."
+    )
+    parser.add_argument(
+        "--values", type=int, default=100_000, help="Cells per run (default: 100000)"
+    )
+    parser.add_argument(
+        "--distinct",
+        type=int,
+        default=500,
+        help="Distinct amounts and dates in the pool (default: 500)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timed runs, best is kept (default: 5)"
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    samples = build_samples(args.values, args.distinct, args.seed)
+    check_equivalence(samples)
+
+    decimals = samples["decimal"]
+    dates = samples["date"]
+
+    def reference_decimal() -> None:
+        for value in decimals:
+            parse_decimal(value)
+
+    def reference_date() -> None:
+        for value in dates:
+            parse_date_value(value, allow_excel_serial=True)
+
+    def engine_decimal(engine: ValueParser) -> None:
+        for value in decimals:
+            engine.parse_decimal(value)
+
+    def engine_date(engine: ValueParser) -> None:
+        for value in dates:
+            engine.parse_date(value, allow_excel_serial=True)
+
+    # "cold" builds a fresh parser per run; "warm" reuses one whose caches are already filled.
+    warm = ValueParser()
+    engine_decimal(warm)
+    engine_date(warm)
+    cases = [
+        ("decimal", "reference", reference_decimal),
+        ("decimal", "engine cold", lambda: engine_decimal(ValueParser())),
+        ("decimal", "engine warm", lambda: engine_decimal(warm)),
+        ("date", "reference", reference_date),
+        ("date", "engine cold", lambda: engine_date(ValueParser())),
+        ("date", "engine warm", lambda: engine_date(warm)),
+    ]
+
+    print(
+        f"{args.values} values per run, {args.distinct} distinct amounts/dates, "
+        f"best of {args.repeat}"
+    )
+    print(f"{'kind':<8} {'variant':<12} {'seconds':>9} {'ns/value':>9} {'speedup':>8}")
+    baseline = 0.0
+    for kind, variant, run in cases:
+        seconds = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        if variant == "reference":
+            baseline = seconds
+        per_value = seconds / args.values * 1e9
+        speedup = baseline / seconds
+        print(f"{kind:<8} {variant:<12} {seconds:>9.4f} {per_value:>9.0f} {speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import random
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import openpyxl
+except ModuleNotFoundError as exc:  # pragma: no cover
+    raise SystemExit(
+        "Missing dependency: openpyxl. Install with: python3 -m pip install --user openpyxl"
+    ) from exc
+
+# Header rows seen in the real workbook, spelling drift included. Blank headers are the
+# unlabeled date columns some tabs keep right of a revision total.
+LAYOUTS = [
+    [
+        "ITEM",
+        "CÓDIGO",
+        "Descrição",
+        "Carta  Convite",
+        "TOTAL REV 0",
+        "DATA",
+        "TOTAL REV. 1",
+        "DATA",
+        "TOTAL REV 2",
+        "DATA",
+        "TOTAL REV ATIVA EM CONCORRÊNCIA",
+        "GANHOU CONCORRÊNCIA",
+        "PERDEU CONCORRÊNCIA",
+    ],
+    [
+        "ITEM",
+        "CÓDIGO",
+        "DESCRIÇÃO",
+        "TOTAL REV 0",
+        "",
+        "TOTAL REV 1",
+        "",
+        "GANHOU CONCORRENCIA",
+        "PERDEU CONCORRENCIA",
+    ],
+    ["ITEM", "CODIGO", "OBS", "TOTAL REV0", "DATA", "TOTAL REV1", "DATA", "TOTAL REV 2"],
+    ["ITEM", "CODIGO", "DESCRICAO", "CARTA CONVITE", "TOTAL REV ATIVA EM CONCORRENCIA"],
+]
+CUSTOMER_NAMES = [
+    "Construtora Ação",
+    "Engenharia Beta",
+    "Gama Incorporações",
+    "Delta SA",
+    "Épsilon",
+]
+PROJECTS = ["Torre", "Galpão", "Ponte", "Hospital", "Escola", 'Edifício "A", bloco 2']
+YEARS = [2019, 2020, 2021, 2022, 2023, 2024]
+
+
+def money_cell(rng: random.Random, messiness: float) -> object:
+    value = round(rng.uniform(5_000, 2_500_000), 2)
+    if rng.random() >= messiness:
+        return value
+    integer, cents = divmod(round(value * 100), 100)
+    return rng.choice(
+        [
+            f"R$ {integer:,}".replace(",", ".") + f",{cents:02d}",
+            f"{integer:,}.{cents:02d}",
+            int(value),
+            "-",
+            "a definir",
+            round(value, 3),
+        ]
+    )
+
+
+def date_cell(rng: random.Random, year: int, messiness: float, *, labeled: bool) -> object:
+    moment = datetime(year, rng.randint(1, 12), rng.randint(1, 28))
+    if rng.random() >= messiness:
+        return moment
+    serial = (moment - datetime(1899, 12, 30)).days
+    return rng.choice(
+        [
+            moment.strftime("%d/%m/%Y"),
+            moment.strftime("%Y-%m-%d"),
+            serial if labeled else moment,
+            serial + 0.5,
+            "n/d",
+            None,
+        ]
+    )
+
+
+def sheet_rows(
+    rng: random.Random,
+    layout: list[str],
+    acronym: str,
+    rows: int,
+    messiness: float,
+) -> list[list[object]]:
+    sequences = rng.sample(range(1, 10_000), rows)
+    data: list[list[object]] = []
+    for item, seq in enumerate(sequences, start=1):
+        year = rng.choice(YEARS)
+        code: object = f"BV-{acronym}-{year}-BIM-{seq:04d}"
+        if rng.random() < messiness * 0.2:
+            code = rng.choice([None, "cancelada", f"BV-{acronym}-{year}-{seq}", f" {code} "])
+
+        values: list[object] = [item, code]
+        revisions_left = rng.randint(1, 3)
+        closed = rng.random()
+        for header in layout[2:]:
+            normalized = header.upper()
+            if "DESCRI" in normalized or normalized == "OBS":
+                values.append(f"Projeto {seq} {rng.choice(PROJECTS)}")
+            elif "CARTA" in normalized:
+                values.append(f"CC-{rng.randint(1, 999):03d}" if rng.random() < 0.6 else None)
+            elif "ATIVA" in normalized:
+                values.append(money_cell(rng, messiness) if closed < 0.5 else None)
+            elif "GANHOU" in normalized:
+                values.append(money_cell(rng, messiness) if 0.5 <= closed < 0.7 else None)
+            elif "PERDEU" in normalized:
+                values.append(money_cell(rng, messiness) if closed >= 0.7 else None)
+            elif "TOTAL" in normalized:
+                values.append(money_cell(rng, messiness) if revisions_left > 0 else None)
+                revisions_left -= 1
+            else:
+                labeled = normalized == "DATA"
+                filled = values[-1] is not None
+                values.append(date_cell(rng, year, messiness, labeled=labeled) if filled else None)
+        data.append(values)
+        if rng.random() < messiness * 0.05:
+            data.append([])
+    return data
+
+
+def build_workbook(
+    path: Path,
+    *,
+    sheets: int = 20,
+    rows: int = 500,
+    messiness: float = 0.1,
+    seed: int = 7,
+) -> Path:
+    """Writes a synthetic legacy workbook: a RESUMO tab plus one tab per customer.
+
+    Every customer tab has a title on row 1, headers on row 4 in one of the known layouts and
+    proposal rows from row 5. messiness (0 to 1) is the share of cells written the way people
+    typed them in the real workbook: money and dates as text, Excel serials, junk codes.
+    """
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    summary = workbook.create_sheet("RESUMO")
+    summary.append(["Resumo de propostas"])
+
+    for index in range(sheets):
+        name = CUSTOMER_NAMES[index % len(CUSTOMER_NAMES)]
+        if index >= len(CUSTOMER_NAMES):
+            name = f"{name} {index // len(CUSTOMER_NAMES) + 1}"
+        acronym = "".join(word[0] for word in name.split()).upper() + f"{index:02d}"
+        acronym = acronym.encode("ascii", "ignore").decode() or f"C{index:02d}"
+        layout = LAYOUTS[index % len(LAYOUTS)]
+
+        sheet = workbook.create_sheet(name)
+        sheet.append([f"Propostas - {name}"])
+        sheet.append([])
+        sheet.append([])
+        sheet.append(layout)
+        for values in sheet_rows(rng, layout, acronym, rows, messiness):
+            sheet.append(values)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    workbook.save(path)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generates a synthetic legacy proposals workbook for benchmarks."
+    )
+    parser.add_argument("--output", required=True, help="Path of the .xlsx file to write")
+    parser.add_argument(
+        "--sheets", type=int, default=20, help="Customer tabs to generate (default: 20)"
+    )
+    parser.add_argument(
+        "--rows", type=int, default=500, help="Proposal rows per customer tab (default: 500)"
+    )
+    parser.add_argument(
+        "--messiness",
+        type=float,
+        default=0.1,
+        help="Share of cells typed as text, serials or junk, from 0 to 1 (default: 0.1)",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if not 0 <= args.messiness <= 1:
+        raise SystemExit("--messiness must be between 0 and 1")
+    if not 1 <= args.rows < 10_000:
+        raise SystemExit("--rows must be between 1 and 9999")
+
+    path = build_workbook(
+        Path(args.output).expanduser(),
+        sheets=args.sheets,
+        rows=args.rows,
+        messiness=args.messiness,
+        seed=args.seed,
+    )
+    print(f"OK: {path} ({args.sheets} customer sheets x {args.rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
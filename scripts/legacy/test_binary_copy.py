@@ -0,0 +1,194 @@
+"""Round-trip checks of the PostgreSQL binary COPY encoder in transform_legacy_proposals.py.
+
+The decoder below follows the wire format as PostgreSQL documents it (COPY's binary file
+format, numeric_send and timestamptz_send), independently of the encoder under test.
+Run with: python3 -m unittest test_binary_copy (or pytest) from scripts/legacy.
+"""
+from __future__ import annotations
+
+import gzip
+import struct
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+from transform_legacy_proposals import (
+    BinaryCopyWriter,
+    pgcopy_integer,
+    pgcopy_numeric,
+    pgcopy_text,
+    pgcopy_timestamptz,
+)
+
+SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+NUMERIC_NEG = 0x4000
+PG_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def field(data: bytes) -> bytes | None:
+    """Payload of one encoded field, None for NULL; the length word must match."""
+    (length,) = struct.unpack(">i", data[:4])
+    if length == -1:
+        assert len(data) == 4
+        return None
+    assert len(data) == 4 + length
+    return data[4:]
+
+
+def numeric_header(payload: bytes) -> tuple[int, int, int, int, tuple[int, ...]]:
+    ndigits, weight, sign, dscale = struct.unpack(">hhHh", payload[:8])
+    digits = struct.unpack(f">{ndigits}H", payload[8:])
+    return ndigits, weight, sign, dscale, digits
+
+
+def decode_numeric(payload: bytes) -> Decimal:
+    _, weight, sign, dscale, digits = numeric_header(payload)
+    value = sum(
+        (Decimal(digit) * Decimal(10000) ** (weight - index) for index, digit in enumerate(digits)),
+        Decimal(0),
+    )
+    value = value.quantize(Decimal(1).scaleb(-dscale))
+    return -value if sign == NUMERIC_NEG else value
+
+
+def decode_timestamptz(payload: bytes) -> datetime:
+    (microseconds,) = struct.unpack(">q", payload)
+    return PG_EPOCH + timedelta(microseconds=microseconds)
+
+
+def read_copy_file(path: Path) -> list[list[bytes | None]]:
+    data = path.read_bytes()
+    assert data[:11] == SIGNATURE
+    flags, extension = struct.unpack(">ii", data[11:19])
+    assert (flags, extension) == (0, 0)
+    position = 19
+    rows: list[list[bytes | None]] = []
+    while True:
+        (count,) = struct.unpack(">h", data[position : position + 2])
+        position += 2
+        if count == -1:
+            break
+        row: list[bytes | None] = []
+        for _ in range(count):
+            (length,) = struct.unpack(">i", data[position : position + 4])
+            position += 4
+            if length == -1:
+                row.append(None)
+                continue
+            row.append(data[position : position + length])
+            position += length
+        rows.append(row)
+    assert position == len(data), "bytes after the trailer"
+    return rows
+
+
+class NumericTest(unittest.TestCase):
+    def test_header_fields(self) -> None:
+        # (value, ndigits, weight, sign, dscale, base-10000 digits)
+        cases = [
+            ("12345.67", 3, 1, 0, 2, (1, 2345, 6700)),
+            ("-0.05", 1, -1, NUMERIC_NEG, 2, (500,)),
+            ("10000", 1, 1, 0, 0, (1,)),
+            ("10000.00", 1, 1, 0, 2, (1,)),
+            ("0.0001", 1, -1, 0, 4, (1,)),
+            ("99999999999999.99", 5, 3, 0, 2, (99, 9999, 9999, 9999, 9900)),
+            ("0", 0, 0, 0, 0, ()),
+            ("0.00", 0, 0, 0, 2, ()),
+            # Negative zero is stored unsigned, as PostgreSQL does.
+            ("-0.00", 0, 0, 0, 2, ()),
+        ]
+        for value, *expected in cases:
+            with self.subTest(value=value):
+                payload = field(pgcopy_numeric(value))
+                assert payload is not None
+                self.assertEqual(numeric_header(payload), tuple(expected))
+
+    def test_round_trip(self) -> None:
+        for value in ["1", "5.10", "-1234.5", "100000000.5", "0.01", "-99.99", "2500000.00"]:
+            with self.subTest(value=value):
+                payload = field(pgcopy_numeric(value))
+                assert payload is not None
+                decoded = decode_numeric(payload)
+                self.assertEqual(decoded, Decimal(value))
+                # dscale keeps the written scale, so "5.10" does not come back as "5.1".
+                self.assertEqual(str(decoded), value)
+
+    def test_empty_is_null(self) -> None:
+        self.assertIsNone(field(pgcopy_numeric("")))
+
+
+class ScalarTest(unittest.TestCase):
+    def test_timestamptz(self) -> None:
+        cases = {
+            "2000-01-01T00:00:00Z": 0,
+            "2000-01-02T00:00:00Z": 86_400_000_000,
+            "1999-12-31T23:59:59Z": -1_000_000,
+            "2024-03-05T12:30:00+00:00": 762_957_000_000_000,
+        }
+        for value, microseconds in cases.items():
+            with self.subTest(value=value):
+                self.assertEqual(field(pgcopy_timestamptz(value)), struct.pack(">q", microseconds))
+        self.assertIsNone(field(pgcopy_timestamptz("")))
+
+    def test_integer(self) -> None:
+        self.assertEqual(field(pgcopy_integer(2024)), struct.pack(">i", 2024))
+        self.assertEqual(field(pgcopy_integer("-7")), struct.pack(">i", -7))
+        self.assertIsNone(field(pgcopy_integer("")))
+        self.assertIsNone(field(pgcopy_integer(None)))
+
+    def test_text_keeps_empty_strings(self) -> None:
+        self.assertEqual(field(pgcopy_text("Ação")), "Ação".encode("utf-8"))
+        self.assertEqual(field(pgcopy_text("")), b"")
+        self.assertIsNone(field(pgcopy_text(None)))
+
+
+class BinaryCopyWriterTest(unittest.TestCase):
+    COLUMN_TYPES = {
+        "code": "text",
+        "year": "integer",
+        "value": "numeric(14, 2)",
+        "percent": "numeric(5, 2)",
+        "created_at": "timestamptz",
+    }
+    ROWS = [
+        ["BV-ABC-2024-BIM-0001", "2024", "1234.50", "10.00", "2024-03-05T12:30:00Z"],
+        ["BV-ABC-2023-BIM-0002", "2023", "-0.05", "", ""],
+        ["", "", "", "", ""],
+    ]
+
+    def write_and_read(self, path: Path) -> list[list[bytes | None]]:
+        with BinaryCopyWriter(path, self.COLUMN_TYPES, list) as writer:
+            writer.write(self.ROWS[:1])
+            writer.write(self.ROWS[1:])
+        if path.suffix == ".gz":
+            # Compressed outputs must hold exactly the bytes of the plain file.
+            plain = path.with_suffix("")
+            plain.write_bytes(gzip.decompress(path.read_bytes()))
+            path = plain
+        return read_copy_file(path)
+
+    def test_file_round_trip(self) -> None:
+        for name in ("table.pgcopy", "table.pgcopy.gz"):
+            with self.subTest(name=name), tempfile.TemporaryDirectory() as directory:
+                rows = self.write_and_read(Path(directory) / name)
+                self.assertEqual(len(rows), len(self.ROWS))
+                first, second, empty = rows
+                self.assertEqual(first[0], b"BV-ABC-2024-BIM-0001")
+                self.assertEqual(first[1], struct.pack(">i", 2024))
+                assert first[2] is not None and first[3] is not None and first[4] is not None
+                self.assertEqual(str(decode_numeric(first[2])), "1234.50")
+                self.assertEqual(str(decode_numeric(first[3])), "10.00")
+                self.assertEqual(
+                    decode_timestamptz(first[4]), datetime(2024, 3, 5, 12, 30, tzinfo=timezone.utc)
+                )
+                assert second[2] is not None
+                self.assertEqual(str(decode_numeric(second[2])), "-0.05")
+                self.assertEqual(second[3:], [None, None])
+                # Text keeps the empty string; typed columns turn it into NULL.
+                self.assertEqual(empty, [b"", None, None, None, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,25 +2,50 @@
 from __future__ import annotations
 
 import argparse
+import cProfile
 import csv
+import glob
+import gzip
+import hashlib
+import io
 import json
+import operator
+import posixpath
 import re
+import shutil
+import struct
+import sys
+import time
 import unicodedata
+import zipfile
+import zlib
 from collections import Counter
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from itertools import islice
 from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from pathlib import Path
+from typing import IO, Any, Callable, Container, Iterable, Iterator, Sequence
+from xml.etree import ElementTree
 
-try:
-    import openpyxl
-    from openpyxl.utils.datetime import from_excel
-except ModuleNotFoundError as exc:  # pragma: no cover
-    raise SystemExit(
-        "Missing dependency: openpyxl. Install with: python3 -m pip install --user openpyxl"
-    ) from exc
-
+# Bump whenever the extracted records or their serialized form change; it invalidates
+# cached sheets and checkpoints.
+SCRIPT_VERSION = "1.4.0"
 SKIP_SHEETS = {"RESUMO"}
+HEADER_ROW = 4
+FIRST_DATA_ROW = 5
+WORKBOOK_ENGINES = ("xml", "full", "streaming")
+ENGINES = (*WORKBOOK_ENGINES, "csv")
+COPY_FORMATS = ("csv", "binary")
+OUTPUT_FORMATS = ("csv", "parquet")
+# Suffix each compression adds to the CSV and binary COPY outputs.
+COMPRESSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+DUPLICATE_POLICIES = ("first-wins", "last-wins", "latest-updated-wins", "fail-fast")
+# Runs write here first, inside the output directory so publishing is a rename.
+STAGING_DIR = ".staging"
 PROPOSAL_CODE_RE = re.compile(r"^BV-([A-Z0-9]+)-(\d{4})-BIM-(\d{4})$")
 
 
@@ -33,7 +58,8 @@ class CustomerRecord:
     notes: str = ""
 
 
-@dataclass
+# Extracted records keep typed values; proposal_row and revision_row format them for output.
+@dataclass(slots=True)
 class ProposalRecord:
     customer_slug: str
     code: str
@@ -43,30 +69,31 @@ class ProposalRecord:
     project_name: str
     scope_description: str
     status: str
-    estimated_value_brl: str
-    final_value_brl: str
+    estimated_value_brl: Decimal | None
+    final_value_brl: Decimal | None
     outcome_reason: str
-    created_at: str
-    updated_at: str
+    created_at: date
+    updated_at: date
     legacy_sheet: str
     legacy_row: int
 
 
-@dataclass
+@dataclass(slots=True)
 class ProposalRevisionRecord:
     proposal_code: str
     revision_number: int
-    value_before_brl: str
-    value_after_brl: str
+    value_before_brl: Decimal | None
+    value_after_brl: Decimal | None
     reason: str
     scope_changes: str
-    discount_brl: str
-    discount_percent: str
+    discount_brl: Decimal | None
+    discount_percent: Decimal | None
     notes: str
-    created_at: str
+    created_at: date
     legacy_sheet: str
     legacy_row: int
-    legacy_revision_label: str
+    # The N of the sheet's TOTAL REV N column, written as REV.N.
+    legacy_revision_label: int
 
 
 @dataclass
@@ -156,6 +183,35 @@ def parse_decimal(value: object) -> Decimal | None:
         return None
 
 
+WINDOWS_EPOCH = datetime(1899, 12, 30)
+MAC_EPOCH = datetime(1904, 1, 1)
+
+
+def from_excel(
+    value: int | float, epoch: datetime = WINDOWS_EPOCH, *, as_timedelta: bool = False
+) -> object:
+    """Excel serial to datetime, the same conversion as openpyxl.utils.datetime.from_excel.
+
+    The time of day is rounded to milliseconds, serials below 1 are times, and serials
+    below 60 are shifted by Excel's phantom 1900-02-29.
+    """
+    if as_timedelta:
+        delta = timedelta(days=value)
+        if delta.microseconds:
+            delta = timedelta(
+                seconds=delta.total_seconds() // 1, microseconds=round(delta.microseconds, -3)
+            )
+        return delta
+
+    day, fraction = divmod(value, 1)
+    diff = timedelta(milliseconds=round(fraction * 86400 * 1000))
+    if 0 <= value < 1 and diff.days == 0:
+        return (datetime.min + diff).time()
+    if 0 < value < 60 and epoch == WINDOWS_EPOCH:
+        day += 1
+    return epoch + timedelta(days=day) + diff
+
+
 def parse_date_value(value: object, *, allow_excel_serial: bool) -> date | None:
     if value is None:
         return None
@@ -188,16 +244,128 @@ def parse_date_value(value: object, *, allow_excel_serial: bool) -> date | None:
     return None
 
 
+CENTS = Decimal("0.01")
+# Shapes that cover nearly every money and date cell in the legacy workbooks. Anything else
+# goes through parse_decimal / parse_date_value, which remain the reference behaviour.
+PLAIN_NUMBER_RE = re.compile(r"-?[0-9]+(?:\.[0-9]+)?")
+BRL_NUMBER_RE = re.compile(r"(?:R\$)? *(-?)([0-9]{1,3}(?:\.[0-9]{3})+|[0-9]+),([0-9]+)")
+US_NUMBER_RE = re.compile(r"(?:R\$)? *(-?)([0-9]{1,3}(?:,[0-9]{3})+)\.([0-9]+)")
+DMY_DATE_RE = re.compile(r"([0-9]{1,2})/([0-9]{1,2})/([0-9]{4})")
+ISO_DATE_RE = re.compile(r"([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})")
+
+
+class ValueParser:
+    """Type-dispatching, memoizing equivalent of parse_decimal and parse_date_value.
+
+    Legacy sheets repeat the same dates, serials and round totals across thousands of rows,
+    so text and numeric cells are parsed once per distinct value and kept in bounded LRU
+    caches. The caches are typed, so 1 and 1.0 are never conflated.
+    """
+
+    def __init__(self, cache_size: int = 8192) -> None:
+        memoize = lru_cache(maxsize=cache_size, typed=True)
+        self._decimal_from_text = memoize(self._parse_decimal_text)
+        self._decimal_from_number = memoize(self._parse_decimal_number)
+        self._date_from_text = memoize(self._parse_date_text)
+        self._date_from_serial = memoize(self._parse_date_serial)
+
+    def parse_decimal(self, value: object) -> Decimal | None:
+        value_type = type(value)
+        if value is None:
+            return None
+        if value_type is str:
+            return self._decimal_from_text(value)
+        if value_type is int or value_type is float:
+            return self._decimal_from_number(value)
+        return parse_decimal(value)
+
+    def parse_date(self, value: object, *, allow_excel_serial: bool) -> date | None:
+        value_type = type(value)
+        if value is None:
+            return None
+        if value_type is datetime:
+            return value.date()  # type: ignore[attr-defined]
+        if value_type is str:
+            return self._date_from_text(value)
+        if value_type is int or value_type is float:
+            return self._date_from_serial(value) if allow_excel_serial else None
+        return parse_date_value(value, allow_excel_serial=allow_excel_serial)
+
+    def cache_info(self) -> dict[str, object]:
+        return {
+            "decimal_text": self._decimal_from_text.cache_info(),
+            "decimal_number": self._decimal_from_number.cache_info(),
+            "date_text": self._date_from_text.cache_info(),
+            "date_serial": self._date_from_serial.cache_info(),
+        }
+
+    @staticmethod
+    def _parse_decimal_text(value: str) -> Decimal | None:
+        text = value.strip()
+        if PLAIN_NUMBER_RE.fullmatch(text):
+            return Decimal(text).quantize(CENTS, rounding=ROUND_HALF_UP)
+        match = BRL_NUMBER_RE.fullmatch(text)
+        if match is not None:
+            sign, integer, fraction = match.groups()
+            integer = integer.replace(".", "")
+        else:
+            match = US_NUMBER_RE.fullmatch(text)
+            if match is None:
+                return parse_decimal(value)
+            sign, integer, fraction = match.groups()
+            integer = integer.replace(",", "")
+        return Decimal(f"{sign}{integer}.{fraction}").quantize(CENTS, rounding=ROUND_HALF_UP)
+
+    @staticmethod
+    def _parse_decimal_number(value: int | float) -> Decimal:
+        return Decimal(str(value)).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+    @staticmethod
+    def _parse_date_text(value: str) -> date | None:
+        text = value.strip()
+        match = DMY_DATE_RE.fullmatch(text)
+        if match is not None:
+            first, second, year = (int(part) for part in match.groups())
+            # Same precedence as parse_date_value: day-first, then month-first.
+            for month, day in ((second, first), (first, second)):
+                try:
+                    return date(year, month, day)
+                except ValueError:
+                    continue
+            return None
+        match = ISO_DATE_RE.fullmatch(text)
+        if match is not None:
+            try:
+                return date(*(int(part) for part in match.groups()))
+            except ValueError:
+                return None
+        return parse_date_value(value, allow_excel_serial=False)
+
+    @staticmethod
+    def _parse_date_serial(value: int | float) -> date | None:
+        return parse_date_value(value, allow_excel_serial=True)
+
+
+VALUE_PARSER = ValueParser()
+
+
 def decimal_to_csv(value: Decimal | None) -> str:
     if value is None:
         return ""
     return f"{value:.2f}"
 
 
+@lru_cache(maxsize=65536)
 def date_to_timestamp_csv(value: date) -> str:
     return f"{value.isoformat()}T00:00:00Z"
 
 
+def cell_value(values: Sequence[object], col: int) -> object:
+    if 1 <= col <= len(values):
+        return values[col - 1]
+    return None
+
+
 def pick_first(*values: Decimal | None) -> Decimal | None:
     for value in values:
         if value is not None:
@@ -212,20 +380,792 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--input",
         required=True,
-        help="Path to legacy .xlsx file",
+        help=(
+            "Path to legacy .xlsx file, a directory of .xlsx files or a glob pattern; "
+            "several workbooks are merged into one set of outputs. With --engine csv, a "
+            "directory of per-sheet CSV exports (or a glob of such directories)"
+        ),
     )
     parser.add_argument(
         "--output-dir",
         default="tmp/legacy-import",
         help="Output directory (default: tmp/legacy-import)",
     )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="xml",
+        help=(
+            "Workbook reader: 'xml' parses the sheet XML directly and decodes only the "
+            "columns the layout uses, falling back to openpyxl for workbooks it cannot read; "
+            "'full' loads every cell in memory with openpyxl, 'streaming' opens the workbook "
+            "read-only with openpyxl and walks rows one at a time, 'csv' reads a directory "
+            "holding one CSV export per sheet, named after the sheet (default: xml)"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Extract customer sheets in N worker processes; each worker opens its own "
+            "workbook handle, so pair with --engine xml or streaming on large files (default: 1)"
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Keep a manifest of sheet fingerprints and cached records in the output "
+            "directory and only re-extract sheets whose content changed"
+        ),
+    )
+    parser.add_argument(
+        "--copy-format",
+        choices=COPY_FORMATS,
+        default="csv",
+        help=(
+            "How import_legacy.sql loads the staging tables: 'csv' copies the CSV files, "
+            "'binary' also writes PostgreSQL binary COPY files (.pgcopy) into typed staging "
+            "tables so the server skips text parsing and casts (default: csv)"
+        ),
+    )
+    parser.add_argument(
+        "--compress",
+        choices=list(COMPRESSIONS),
+        default="none",
+        help=(
+            "Compress the CSV and .pgcopy outputs as they are written (.csv.gz, .csv.zst); "
+            "import_legacy.sql streams them through gzip -dc or zstd -dc with \\copy FROM "
+            "PROGRAM, so those must be installed where psql runs. zstd requires the "
+            "zstandard package (default: none)"
+        ),
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="csv",
+        help=(
+            "'parquet' also writes customers, proposals and revisions as typed Parquet "
+            "files next to the CSVs, one row group per sheet (requires pyarrow; "
+            "default: csv)"
+        ),
+    )
+    parser.add_argument(
+        "--sql-batch-size",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Commit import_legacy.sql in batches of whole customers holding up to N "
+            "proposals each; committed batches are recorded in legacy_import.batches and "
+            "skipped when the script is run again (default: 0, one transaction)"
+        ),
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Also split proposals and revisions into N files by proposal code hash, each "
+            "with its own import_legacy.shardNN.sql that loads it into unlogged staging "
+            "tables; run those in concurrent psql sessions, then import_legacy.sql merges "
+            "them and upserts (default: 0, no shards)"
+        ),
+    )
+    parser.add_argument(
+        "--on-duplicate",
+        choices=DUPLICATE_POLICIES,
+        default="first-wins",
+        help=(
+            "Which proposal keeps a code found more than once: the first or last one "
+            "extracted, the one with the latest updated_at, or none, stopping the run. "
+            "Discarded proposals and their revisions go to quarantine/ (default: first-wins)"
+        ),
+    )
+    parser.add_argument(
+        "--since",
+        metavar="PREVIOUS_OUTPUT_DIR",
+        help=(
+            "Compare the extracted records with the CSVs of a previous run and also write "
+            "delta/ with only inserted and changed rows, the deleted keys and an SQL script "
+            "that applies just that delta"
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "Record wall and CPU time per stage, rows per second per sheet and peak RSS "
+            "in a metrics block of summary.json"
+        ),
+    )
+    parser.add_argument(
+        "--profile-dump",
+        metavar="PATH",
+        help=(
+            "Implies --profile and also writes cProfile stats of the main process to PATH "
+            "(read with python3 -m pstats PATH)"
+        ),
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Stay running after the export and run it again whenever the input changes. "
+            "Implies --incremental; unchanged sheets reuse the records kept in memory, and "
+            "each output file is replaced whole once it is complete"
+        ),
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="How often --watch checks the input for changes (default: 1)",
+    )
+    parser.add_argument(
+        "--validate-only",
+        action="store_true",
+        help=(
+            "Only read the header row and the code column of each sheet and report "
+            "proposal rows, sheets without a usable mapping and duplicate codes; nothing "
+            "is written. Exits with an error on duplicates when --on-duplicate is fail-fast"
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Reload the per-sheet checkpoints of an interrupted run from the output "
+            "directory and continue with the first unfinished sheet"
+        ),
+    )
     return parser
 
 
-def extract_sheet_mapping(worksheet) -> SheetMapping:
+class StageProfiler:
+    """Wall and CPU seconds per named stage; every hook is a no-op until enabled.
+
+    Stages nest, and each one is charged its own time only: reading rows inside row parsing
+    counts as sheet_read, not twice.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.stages: dict[str, list[float]] = {}
+        self.rows = 0
+        self._children: list[list[float]] = []
+
+    def _begin(self) -> tuple[float, float]:
+        self._children.append([0.0, 0.0])
+        return time.perf_counter(), time.process_time()
+
+    def _end(self, name: str, started: tuple[float, float]) -> None:
+        wall = time.perf_counter() - started[0]
+        cpu = time.process_time() - started[1]
+        child_wall, child_cpu = self._children.pop()
+        totals = self.stages.setdefault(name, [0.0, 0.0])
+        totals[0] += wall - child_wall
+        totals[1] += cpu - child_cpu
+        if self._children:
+            parent = self._children[-1]
+            parent[0] += wall
+            parent[1] += cpu
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        started = self._begin()
+        try:
+            yield
+        finally:
+            self._end(name, started)
+
+    def timed(self, name: str, function: Callable[..., Any]) -> Callable[..., Any]:
+        """Wraps a function called once per row; returned unchanged when disabled."""
+        if not self.enabled:
+            return function
+
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = self._begin()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._end(name, started)
+
+        return wrapper
+
+    def timed_rows(
+        self, name: str, rows: Iterator[tuple[int, tuple[object, ...]]]
+    ) -> Iterator[tuple[int, tuple[object, ...]]]:
+        """Charges the time spent producing each row to `name` and counts the rows."""
+        if not self.enabled:
+            return rows
+        self.rows = 0
+
+        def timed() -> Iterator[tuple[int, tuple[object, ...]]]:
+            while True:
+                started = self._begin()
+                try:
+                    item = next(rows, None)
+                finally:
+                    self._end(name, started)
+                if item is None:
+                    return
+                self.rows += 1
+                yield item
+
+        return timed()
+
+    def drain(self) -> dict[str, list[float]]:
+        stages = self.stages
+        self.stages = {}
+        return stages
+
+    def merge(self, stages: dict[str, list[float]]) -> None:
+        for name, (wall, cpu) in stages.items():
+            totals = self.stages.setdefault(name, [0.0, 0.0])
+            totals[0] += wall
+            totals[1] += cpu
+
+
+PROFILER = StageProfiler()
+
+
+@dataclass
+class SheetProfile:
+    rows: int
+    wall_seconds: float
+    # Stage times recorded while the sheet was extracted, in whichever process ran it.
+    stages: dict[str, list[float]]
+
+
+SPREADSHEETML_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+RELATIONSHIP_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+PACKAGE_RELATIONSHIP_TAG = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+RELATIONSHIP_TYPES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+ROW_TAG = f"{SPREADSHEETML_NS}row"
+CELL_TAG = f"{SPREADSHEETML_NS}c"
+VALUE_TAG = f"{SPREADSHEETML_NS}v"
+TEXT_TAG = f"{SPREADSHEETML_NS}t"
+RUN_TAG = f"{SPREADSHEETML_NS}r"
+INLINE_STRING_TAG = f"{SPREADSHEETML_NS}is"
+SHEET_DATA_TAG = f"{SPREADSHEETML_NS}sheetData"
+# Built-in number formats openpyxl treats as dates (14-22, 45-47) and as durations (46).
+BUILTIN_DATE_FORMATS = {14, 15, 16, 17, 18, 19, 20, 21, 22, 45, 46, 47}
+BUILTIN_TIMEDELTA_FORMATS = {46}
+# openpyxl.styles.numbers.is_date_format and is_timedelta_format.
+NUMBER_FORMAT_STRIP_RE = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+DATE_FORMAT_RE = re.compile(r"(?<![_\\])[dmhysDMHYS]")
+TIMEDELTA_FORMAT_RE = re.compile(
+    r"\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?", re.IGNORECASE
+)
+
+
+class XlsxFormatError(Exception):
+    """The workbook is not laid out the way XlsxReader expects; openpyxl may still read it."""
+
+
+# What a damaged or half-saved part raises while it is being decompressed and parsed.
+XLSX_PART_ERRORS = (ElementTree.ParseError, zipfile.BadZipFile, zlib.error, EOFError, KeyError)
+
+
+def is_date_format(format_code: str) -> bool:
+    format_code = NUMBER_FORMAT_STRIP_RE.sub("", format_code.split(";")[0])
+    return DATE_FORMAT_RE.search(format_code) is not None
+
+
+def is_timedelta_format(format_code: str) -> bool:
+    return TIMEDELTA_FORMAT_RE.search(format_code.split(";")[0]) is not None
+
+
+def inline_text(element: ElementTree.Element) -> str:
+    """Plain text of a string item: its own <t> plus the <t> of each rich text run."""
+    parts = [element.findtext(TEXT_TAG) or ""]
+    parts.extend(run.findtext(TEXT_TAG) or "" for run in element.iterfind(RUN_TAG))
+    return "".join(parts)
+
+
+@lru_cache(maxsize=4096)
+def column_number(letters: str) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - 64
+    return number
+
+
+class XlsxReader:
+    """Reads cell values straight from the workbook's zip and XML parts.
+
+    Gives the same values as openpyxl with data_only=True: shared and inline strings,
+    ints and floats, booleans, error codes and datetimes for numbers in date formats. It
+    skips styles, formulas and cell objects, and decodes only the selected columns of
+    data rows.
+    """
+
+    def __init__(self, xlsx_path: Path) -> None:
+        try:
+            self.archive = zipfile.ZipFile(xlsx_path)
+        except (OSError, zipfile.BadZipFile) as exc:
+            raise XlsxFormatError(f"not an .xlsx archive ({exc})") from exc
+        try:
+            self.workbook_part = self._related_part("", "officeDocument")
+            self.parts = self._relationships(self.workbook_part)
+            workbook = ElementTree.fromstring(self.archive.read(self.workbook_part))
+        except (KeyError, ElementTree.ParseError) as exc:
+            self.archive.close()
+            raise XlsxFormatError(f"unreadable workbook part ({exc})") from exc
+        if workbook.tag != f"{SPREADSHEETML_NS}workbook":
+            # Strict Open XML workbooks use other namespaces.
+            self.archive.close()
+            raise XlsxFormatError(f"unsupported workbook namespace {workbook.tag}")
+
+        properties = workbook.find(f"{SPREADSHEETML_NS}workbookPr")
+        date1904 = properties is not None and properties.get("date1904") in ("1", "true")
+        self.epoch = MAC_EPOCH if date1904 else WINDOWS_EPOCH
+        self.sheet_parts = {
+            sheet.get("name", ""): self.parts[sheet.get(RELATIONSHIP_ID, "")][1]
+            for sheet in workbook.iterfind(f"{SPREADSHEETML_NS}sheets/{SPREADSHEETML_NS}sheet")
+        }
+        self._shared_strings: list[str] | None = None
+        self._date_styles: tuple[set[int], set[int]] | None = None
+
+    def _relationships(self, part: str) -> dict[str, tuple[str, str]]:
+        """Relationship id -> (type, target part) for one part of the package."""
+        directory, name = posixpath.split(part)
+        rels = ElementTree.fromstring(
+            self.archive.read(posixpath.join(directory, "_rels", f"{name}.rels"))
+        )
+        relationships: dict[str, tuple[str, str]] = {}
+        for relationship in rels.iterfind(PACKAGE_RELATIONSHIP_TAG):
+            if relationship.get("TargetMode") == "External":
+                continue
+            target = relationship.get("Target", "")
+            target = target[1:] if target.startswith("/") else posixpath.join(directory, target)
+            relationships[relationship.get("Id", "")] = (
+                relationship.get("Type", ""),
+                posixpath.normpath(target),
+            )
+        return relationships
+
+    def _related_part(self, part: str, relationship_type: str) -> str:
+        for kind, target in self._relationships(part).values():
+            if kind == RELATIONSHIP_TYPES + relationship_type:
+                return target
+        raise KeyError(f"no {relationship_type} relationship")
+
+    def _part_of_type(self, relationship_type: str) -> str | None:
+        for kind, target in self.parts.values():
+            if kind == RELATIONSHIP_TYPES + relationship_type:
+                return target
+        return None
+
+    @property
+    def sheetnames(self) -> list[str]:
+        return list(self.sheet_parts)
+
+    def sheet_signature(self, sheet: str) -> str:
+        """Identifies the stored parts a sheet's values are decoded from, without reading them.
+
+        Equal signatures mean equal values: the zip directory already holds each part's CRC.
+        """
+        parts = [
+            self.sheet_parts[sheet],
+            self.workbook_part,
+            self._part_of_type("sharedStrings"),
+            self._part_of_type("styles"),
+        ]
+        signature = []
+        for part in parts:
+            if part is not None:
+                info = self.archive.getinfo(part)
+                signature.append(f"{info.CRC:08x}:{info.file_size}")
+        return "-".join(signature)
+
+    @property
+    def shared_strings(self) -> list[str]:
+        if self._shared_strings is None:
+            strings: list[str] = []
+            part = self._part_of_type("sharedStrings")
+            if part is not None:
+                try:
+                    with self.archive.open(part) as stream:
+                        for _, element in ElementTree.iterparse(stream):
+                            if element.tag == f"{SPREADSHEETML_NS}si":
+                                # openpyxl drops the escape of a literal "_x" the same way.
+                                strings.append(inline_text(element).replace("x005F_", ""))
+                                element.clear()
+                except XLSX_PART_ERRORS as exc:
+                    raise XlsxFormatError(f"unreadable shared strings ({exc})") from exc
+            self._shared_strings = strings
+        return self._shared_strings
+
+    @property
+    def date_styles(self) -> tuple[set[int], set[int]]:
+        """Indexes of the cell formats showing numbers as dates, and as durations."""
+        if self._date_styles is None:
+            dates: set[int] = set()
+            durations: set[int] = set()
+            part = self._part_of_type("styles")
+            if part is not None:
+                try:
+                    styles = ElementTree.fromstring(self.archive.read(part))
+                except XLSX_PART_ERRORS as exc:
+                    raise XlsxFormatError(f"unreadable styles ({exc})") from exc
+                custom = {
+                    int(number_format.get("numFmtId", "0")): number_format.get("formatCode", "")
+                    for number_format in styles.iterfind(
+                        f"{SPREADSHEETML_NS}numFmts/{SPREADSHEETML_NS}numFmt"
+                    )
+                }
+                cell_formats = styles.iterfind(f"{SPREADSHEETML_NS}cellXfs/{SPREADSHEETML_NS}xf")
+                for index, cell_format in enumerate(cell_formats):
+                    format_id = int(cell_format.get("numFmtId", "0"))
+                    if format_id in custom:
+                        if is_date_format(custom[format_id]):
+                            dates.add(index)
+                        if is_timedelta_format(custom[format_id]):
+                            durations.add(index)
+                    else:
+                        if format_id in BUILTIN_DATE_FORMATS:
+                            dates.add(index)
+                        if format_id in BUILTIN_TIMEDELTA_FORMATS:
+                            durations.add(index)
+            self._date_styles = (dates, durations)
+        return self._date_styles
+
+    def read_sheet(
+        self,
+        sheet: str,
+        columns: Callable[[tuple[object, ...]], Container[int] | None] | None = None,
+    ) -> tuple[tuple[object, ...], Iterator[tuple[int, tuple[object, ...]]]]:
+        """Header row values and an iterator of (row number, values) for the data rows.
+
+        columns, given the header, returns the columns data rows need; the others are left
+        empty. Rows missing from the XML are skipped rather than yielded empty.
+        """
+        rows = self._rows(self.sheet_parts[sheet], columns)
+        header = next(rows)
+        return header, rows  # type: ignore[return-value]
+
+    def _rows(
+        self,
+        part: str,
+        columns: Callable[[tuple[object, ...]], Container[int] | None] | None,
+    ) -> Iterator[Any]:
+        try:
+            yield from self._parse_rows(part, columns)
+        except XLSX_PART_ERRORS as exc:
+            raise XlsxFormatError(f"unreadable sheet part {part} ({exc})") from exc
+
+    def _parse_rows(
+        self,
+        part: str,
+        columns: Callable[[tuple[object, ...]], Container[int] | None] | None,
+    ) -> Iterator[Any]:
+        # Yields the header first, then (row number, values) pairs.
+        selected: Container[int] | None = None
+        header_seen = False
+        row_number = 0
+        sheet_data: ElementTree.Element | None = None
+        with self.archive.open(part) as stream:
+            for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    if element.tag == SHEET_DATA_TAG:
+                        sheet_data = element
+                    continue
+                if element.tag != ROW_TAG:
+                    continue
+                reference = element.get("r")
+                row_number = int(reference) if reference else row_number + 1
+                if row_number < HEADER_ROW:
+                    continue
+                if not header_seen:
+                    header_seen = True
+                    header = self._row_values(element, None) if row_number == HEADER_ROW else ()
+                    yield header
+                    selected = columns(header) if columns is not None else None
+                    if row_number == HEADER_ROW:
+                        continue
+                values = self._row_values(element, selected)
+                # Processed rows are dropped, so memory stays flat however long the sheet is.
+                if sheet_data is not None:
+                    sheet_data.clear()
+                yield row_number, values
+        if not header_seen:
+            yield ()
+
+    def _row_values(
+        self, row: ElementTree.Element, selected: Container[int] | None
+    ) -> tuple[object, ...]:
+        values: list[object] = []
+        column = 0
+        for cell in row.iterfind(CELL_TAG):
+            reference = cell.get("r")
+            column = column_number(reference.rstrip("0123456789")) if reference else column + 1
+            if selected is not None and column not in selected:
+                continue
+            value = self._cell_value(cell)
+            if value is None:
+                continue
+            if len(values) < column - 1:
+                values.extend([None] * (column - 1 - len(values)))
+            values.append(value)
+        return tuple(values)
+
+    def _cell_value(self, cell: ElementTree.Element) -> object:
+        data_type = cell.get("t", "n")
+        if data_type == "inlineStr":
+            inline = cell.find(INLINE_STRING_TAG)
+            return inline_text(inline) if inline is not None else None
+        text = cell.findtext(VALUE_TAG) or None
+        if text is None:
+            return None
+        if data_type == "n":
+            number = float(text) if "." in text or "E" in text or "e" in text else int(text)
+            style = cell.get("s")
+            style_index = int(style) if style else 0
+            dates, durations = self.date_styles
+            if style_index not in dates:
+                return number
+            try:
+                return from_excel(number, self.epoch, as_timedelta=style_index in durations)
+            except (OverflowError, ValueError):
+                return "#VALUE!"
+        if data_type == "s":
+            return self.shared_strings[int(text)]
+        if data_type == "b":
+            return bool(int(text))
+        if data_type == "d":
+            # ISO 8601 cells; Excel itself never writes them.
+            return date.fromisoformat(text) if "T" not in text else datetime.fromisoformat(text)
+        # "str" formula results and "e" error codes are kept as text.
+        return text
+
+    def close(self) -> None:
+        self.archive.close()
+
+
+CSV_ENCODING = "utf-8-sig"
+CSV_SAMPLE_BYTES = 64 * 1024
+INTEGER_TEXT_RE = re.compile(r"-?(?:0|[1-9][0-9]*)")
+FLOAT_TEXT_RE = re.compile(r"-?(?:0|[1-9][0-9]*)\.[0-9]+")
+
+
+def sheet_csv_files(directory: Path) -> list[Path]:
+    return sorted(path for path in directory.glob("*.csv") if path.is_file())
+
+
+def input_files(input_path: Path) -> list[Path]:
+    """Files an input is read from: the workbook itself, or the CSVs of a sheet directory."""
+    return sheet_csv_files(input_path) if input_path.is_dir() else [input_path]
+
+
+def csv_cell(text: str) -> object:
+    """Cell value of a CSV field, typed the way the workbook cell most likely was.
+
+    CSV carries no types, so a field spelled exactly as Python writes an int or float
+    becomes that number, like the numeric cells openpyxl returns; anything else, "007" or
+    "1.234,56" included, stays text. Empty fields are empty cells.
+    """
+    if not text:
+        return None
+    if INTEGER_TEXT_RE.fullmatch(text):
+        return int(text)
+    if FLOAT_TEXT_RE.fullmatch(text) and repr(float(text)) == text:
+        return float(text)
+    return text
+
+
+class CsvSheetReader:
+    """Reads a directory of per-sheet CSV exports as a workbook: each file stem is a sheet.
+
+    Sheets come in file name order. Files are UTF-8 (with or without BOM); the delimiter
+    (comma, semicolon or tab) is sniffed per file. Row numbers are CSV record numbers, so
+    an export of the whole tab keeps the workbook's row numbers.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        if not directory.is_dir():
+            raise SystemExit(f"--engine csv expects a directory of per-sheet CSV files: {directory}")
+        self.files = {path.stem: path for path in sheet_csv_files(directory)}
+
+    @property
+    def sheetnames(self) -> list[str]:
+        return list(self.files)
+
+    def read_sheet(
+        self,
+        sheet: str,
+        columns: Callable[[tuple[object, ...]], Container[int] | None] | None = None,
+    ) -> tuple[tuple[object, ...], Iterator[tuple[int, tuple[object, ...]]]]:
+        # Every field of a CSV record is split anyway, so the column hint buys nothing.
+        rows = self._rows(self.files[sheet])
+        header = next(rows)
+        return header, rows  # type: ignore[return-value]
+
+    def _rows(self, path: Path) -> Iterator[Any]:
+        # Yields the header first, then (row number, values) pairs.
+        header_seen = False
+        with path.open(newline="", encoding=CSV_ENCODING) as handle:
+            try:
+                dialect: Any = csv.Sniffer().sniff(handle.read(CSV_SAMPLE_BYTES), ",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            handle.seek(0)
+            for row_number, fields in enumerate(csv.reader(handle, dialect), start=1):
+                if row_number < HEADER_ROW:
+                    continue
+                values = [csv_cell(text) for text in fields]
+                while values and values[-1] is None:
+                    values.pop()
+                if not header_seen:
+                    header_seen = True
+                    yield tuple(values)
+                    continue
+                yield row_number, tuple(values)
+        if not header_seen:
+            yield ()
+
+    def close(self) -> None:
+        pass
+
+
+def import_openpyxl():  # type: ignore[no-untyped-def]
+    try:
+        import openpyxl
+    except ModuleNotFoundError as exc:  # pragma: no cover
+        raise SystemExit(
+            "Missing dependency: openpyxl. Install with: python3 -m pip install --user openpyxl"
+        ) from exc
+    return openpyxl
+
+
+class WorkbookSource:
+    """Row-tuple view over a legacy workbook, shared by every engine.
+
+    The xml engine reads the workbook with XlsxReader and falls back to openpyxl's streaming
+    reader for workbooks it cannot open; full and streaming always use openpyxl. The csv
+    engine reads a directory of per-sheet CSV exports with CsvSheetReader instead.
+    """
+
+    def __init__(self, xlsx_path: Path, *, engine: str = "xml") -> None:
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        self.path = xlsx_path
+        self.reader: XlsxReader | CsvSheetReader | None = None
+        with PROFILER.stage("workbook_load"):
+            if engine == "csv":
+                self.reader = CsvSheetReader(xlsx_path)
+                return
+            if engine == "xml":
+                try:
+                    self.reader = XlsxReader(xlsx_path)
+                    return
+                except XlsxFormatError as exc:
+                    print(f"{xlsx_path.name}: {exc}; reading it with openpyxl", file=sys.stderr)
+                    engine = "streaming"
+            self.workbook = import_openpyxl().load_workbook(
+                xlsx_path,
+                data_only=True,
+                read_only=engine == "streaming",
+            )
+
+    @property
+    def sheetnames(self) -> list[str]:
+        if self.reader is not None:
+            return self.reader.sheetnames
+        return list(self.workbook.sheetnames)
+
+    def sheet_signature(self, sheet: str) -> str | None:
+        """Cheap identity of a sheet's stored content, for readers that have one."""
+        if isinstance(self.reader, XlsxReader):
+            return f"{self.path.as_posix()}:{sheet}:{self.reader.sheet_signature(sheet)}"
+        return None
+
+    def read_sheet(
+        self,
+        sheet: str,
+        columns: Callable[[tuple[object, ...]], Container[int] | None] | None = None,
+    ) -> tuple[tuple[object, ...], Iterator[tuple[int, tuple[object, ...]]]]:
+        """Returns the header row values and an iterator of (row number, values) for data rows.
+
+        columns is a hint: given the header, it names the columns data rows need, and
+        readers that can skip decoding the others do.
+        """
+        with PROFILER.stage("sheet_read"):
+            if self.reader is not None:
+                header, rows = self.reader.read_sheet(sheet, columns)
+                return header, PROFILER.timed_rows("sheet_read", rows)
+            rows = enumerate(
+                self.workbook[sheet].iter_rows(min_row=HEADER_ROW, values_only=True),
+                start=HEADER_ROW,
+            )
+            _, header = next(rows, (HEADER_ROW, ()))
+        return tuple(header), PROFILER.timed_rows("sheet_read", rows)
+
+    def close(self) -> None:
+        if self.reader is not None:
+            self.reader.close()
+        else:
+            # Read-only workbooks keep the zip archive open until closed.
+            self.workbook.close()
+
+
+def resolve_input_paths(value: str, *, engine: str = "xml") -> list[Path]:
+    if engine == "csv":
+        return resolve_csv_directories(value)
+    if any(char in value for char in "*?["):
+        paths = sorted(
+            Path(match).resolve()
+            for match in glob.glob(str(Path(value).expanduser()), recursive=True)
+            if Path(match).is_file()
+        )
+        if not paths:
+            raise SystemExit(f"No files match: {value}")
+        return paths
+
+    input_path = Path(value).expanduser().resolve()
+    if input_path.is_dir():
+        # "~$" files are Excel lock files left next to open workbooks.
+        paths = sorted(
+            path for path in input_path.glob("*.xlsx") if not path.name.startswith("~$")
+        )
+        if not paths:
+            raise SystemExit(f"No .xlsx files found in: {input_path}")
+        return paths
+
+    if not input_path.exists():
+        raise SystemExit(f"File not found: {input_path}")
+    return [input_path]
+
+
+def resolve_csv_directories(value: str) -> list[Path]:
+    """Directories of per-sheet CSV files; each one is read as a separate workbook."""
+    if any(char in value for char in "*?["):
+        paths = sorted(
+            Path(match).resolve()
+            for match in glob.glob(str(Path(value).expanduser()), recursive=True)
+            if Path(match).is_dir()
+        )
+    else:
+        paths = [Path(value).expanduser().resolve()]
+        if not paths[0].is_dir():
+            raise SystemExit(f"Directory not found: {paths[0]}")
+    paths = [path for path in paths if sheet_csv_files(path)]
+    if not paths:
+        raise SystemExit(f"No .csv files found in: {value}")
+    return paths
+
+
+def extract_sheet_mapping(header_values: Sequence[object]) -> SheetMapping:
     headers: dict[int, str] = {}
-    for col in range(1, worksheet.max_column + 1):
-        normalized = normalize_header(worksheet.cell(row=4, column=col).value)
+    for col, value in enumerate(header_values, start=1):
+        normalized = normalize_header(value)
         if normalized:
             headers[col] = normalized
 
@@ -257,30 +1197,147 @@ def extract_sheet_mapping(worksheet) -> SheetMapping:
     )
 
 
-def parse_revisions_from_row(worksheet, row: int, mapping: SheetMapping) -> list[dict[str, object]]:
-    parsed: list[dict[str, object]] = []
+def header_signature(header_values: Sequence[object]) -> str:
+    """Identifies a sheet layout by its raw header row, before any normalization."""
+    end = len(header_values)
+    while end and header_values[end - 1] is None:
+        end -= 1
+    return hashlib.sha256(repr(tuple(header_values[:end])).encode("utf-8")).hexdigest()[:16]
+
+
+def mapping_to_json(mapping: SheetMapping) -> dict[str, object]:
+    # JSON objects only have string keys, so the column maps are stored as pairs.
+    return {
+        "description_col": mapping.description_col,
+        "invitation_col": mapping.invitation_col,
+        "active_col": mapping.active_col,
+        "won_col": mapping.won_col,
+        "lost_col": mapping.lost_col,
+        "rev_value_cols": sorted(mapping.rev_value_cols.items()),
+        "data_cols": mapping.data_cols,
+        "headers": sorted(mapping.headers.items()),
+    }
+
+
+def mapping_from_json(data: dict[str, Any]) -> SheetMapping:
+    return SheetMapping(
+        description_col=data["description_col"],
+        invitation_col=data["invitation_col"],
+        active_col=data["active_col"],
+        won_col=data["won_col"],
+        lost_col=data["lost_col"],
+        rev_value_cols={revision: col for revision, col in data["rev_value_cols"]},
+        data_cols=list(data["data_cols"]),
+        headers={col: header for col, header in data["headers"]},
+    )
+
+
+@dataclass(frozen=True)
+class ColumnSelection:
+    """Columns a sheet mapping reads: the listed ones plus every column from from_column on."""
+
+    columns: frozenset[int]
+    from_column: int | None = None
+
+    def __contains__(self, column: object) -> bool:
+        if column in self.columns:
+            return True
+        return self.from_column is not None and column >= self.from_column  # type: ignore[operator]
+
+
+def mapping_columns(mapping: SheetMapping) -> ColumnSelection:
+    """Columns parse_sheet can read under mapping; the other cells of a row never matter."""
+    columns = {2, *mapping.data_cols}
+    for col in (mapping.description_col, mapping.invitation_col, mapping.active_col):
+        if col is not None:
+            columns.add(col)
+    outcome_cols = [col for col in (mapping.won_col, mapping.lost_col) if col is not None]
+    columns.update(outcome_cols)
+    if not mapping.rev_value_cols:
+        return ColumnSelection(frozenset(columns))
+
+    # Revision dates come from the column right of a total or from orphan cells between the
+    # first revision and the outcome columns, up to the end of the row if there are none.
+    rev_cols = mapping.rev_value_cols.values()
+    columns.update(col + 1 for col in rev_cols)
+    first_rev_col = min(rev_cols)
+    if not outcome_cols:
+        return ColumnSelection(frozenset(columns), first_rev_col)
+    columns.update(range(first_rev_col, min(outcome_cols)))
+    return ColumnSelection(frozenset(columns))
+
+
+def sheet_columns(header_values: Sequence[object]) -> ColumnSelection:
+    return mapping_columns(SHEET_MAPPINGS.resolve(header_values)[1])
+
+
+class MappingCache:
+    """SheetMapping per header-row signature, so each distinct layout is resolved once."""
+
+    def __init__(self) -> None:
+        self.mappings: dict[str, SheetMapping] = {}
+
+    def resolve(self, header_values: Sequence[object]) -> tuple[str, SheetMapping]:
+        signature = header_signature(header_values)
+        mapping = self.mappings.get(signature)
+        if mapping is None:
+            mapping = extract_sheet_mapping(header_values)
+            self.mappings[signature] = mapping
+        return signature, mapping
+
+    def load(self, path: Path) -> None:
+        """Seeds the cache from the layouts report of a previous run."""
+        if not path.exists():
+            return
+        report = json.loads(path.read_text(encoding="utf-8"))
+        # Mappings resolved by another version of the script may differ.
+        if report.get("script_version") != SCRIPT_VERSION:
+            return
+        for layout in report["layouts"]:
+            self.mappings[layout["signature"]] = mapping_from_json(layout["mapping"])
+
+
+SHEET_MAPPINGS = MappingCache()
+
+
+@dataclass(slots=True)
+class InferredRevision:
+    label: int
+    value_col: int
+    # None only for the synthetic R0 of a row without any revision or outcome value.
+    value: Decimal | None
+    date: date | None
+
+
+REVISION_COLUMN = operator.attrgetter("value_col")
+
+
+def parse_revisions_from_row(values: Sequence[object], mapping: SheetMapping) -> list[InferredRevision]:
+    parsed: list[InferredRevision] = []
     used_date_cols: set[int] = set()
+    # Cells past the end of the row are empty, so the row length bounds every scan.
+    max_column = len(values)
 
     all_rev_cols = sorted(mapping.rev_value_cols.values())
 
     for revision_label in sorted(mapping.rev_value_cols):
         value_col = mapping.rev_value_cols[revision_label]
-        raw_value = worksheet.cell(row=row, column=value_col).value
-        revision_value = parse_decimal(raw_value)
+        raw_value = cell_value(values, value_col)
+        revision_value = VALUE_PARSER.parse_decimal(raw_value)
 
         next_bound_candidates = [col for col in all_rev_cols if col > value_col]
         if mapping.won_col is not None:
             next_bound_candidates.append(mapping.won_col)
         if mapping.lost_col is not None:
             next_bound_candidates.append(mapping.lost_col)
-        next_bound = min(next_bound_candidates) if next_bound_candidates else worksheet.max_column + 1
+        next_bound = min(next_bound_candidates) if next_bound_candidates else max_column + 1
 
         revision_date: date | None = None
         explicit_data_cols = [col for col in mapping.data_cols if value_col < col < next_bound]
         if explicit_data_cols:
             selected_data_col = explicit_data_cols[0]
-            revision_date = parse_date_value(
-                worksheet.cell(row=row, column=selected_data_col).value,
+            revision_date = VALUE_PARSER.parse_date(
+                cell_value(values, selected_data_col),
                 allow_excel_serial=True,
             )
             if revision_date is not None:
@@ -289,479 +1346,2064 @@ def parse_revisions_from_row(worksheet, row: int, mapping: SheetMapping) -> list
         if revision_value is None:
             continue
 
-        parsed.append(
-            {
-                "label": revision_label,
-                "value_col": value_col,
-                "value": revision_value,
-                "date": revision_date,
-            }
-        )
+        parsed.append(InferredRevision(revision_label, value_col, revision_value, revision_date))
 
     if not parsed:
         return parsed
 
     # If date is still missing, try immediate right column.
     for revision in parsed:
-        if revision["date"] is not None:
+        if revision.date is not None:
             continue
 
-        value_col = int(revision["value_col"])
-        right_col = value_col + 1
+        right_col = revision.value_col + 1
         right_header = mapping.headers.get(right_col, "")
         allow_serial = right_header == "DATA"
 
-        inferred_date = parse_date_value(
-            worksheet.cell(row=row, column=right_col).value,
+        inferred_date = VALUE_PARSER.parse_date(
+            cell_value(values, right_col),
             allow_excel_serial=allow_serial,
         )
         if inferred_date is not None:
-            revision["date"] = inferred_date
+            revision.date = inferred_date
             used_date_cols.add(right_col)
 
     # Fallback: capture orphan date-like cells between first revision and outcome columns.
-    region_start = min(int(item["value_col"]) for item in parsed)
+    region_start = min(item.value_col for item in parsed)
     outcome_candidates = [col for col in (mapping.won_col, mapping.lost_col) if col is not None]
-    region_end = min(outcome_candidates) - 1 if outcome_candidates else worksheet.max_column
+    region_end = min(outcome_candidates) - 1 if outcome_candidates else max_column
 
-    value_cols = {int(item["value_col"]) for item in parsed}
+    value_cols = {item.value_col for item in parsed}
     for col in range(region_start, region_end + 1):
         if col in value_cols or col in used_date_cols:
             continue
 
         allow_serial = mapping.headers.get(col, "") == "DATA"
-        orphan_date = parse_date_value(
-            worksheet.cell(row=row, column=col).value,
+        orphan_date = VALUE_PARSER.parse_date(
+            cell_value(values, col),
             allow_excel_serial=allow_serial,
         )
         if orphan_date is None:
             continue
 
-        candidates = [
-            item
-            for item in parsed
-            if item["date"] is None and int(item["value_col"]) < col
-        ]
+        candidates = [item for item in parsed if item.date is None and item.value_col < col]
         if not candidates:
             continue
 
-        candidates[-1]["date"] = orphan_date
+        candidates[-1].date = orphan_date
         used_date_cols.add(col)
 
     return parsed
 
 
-def fill_revision_dates(
-    revisions: list[dict[str, object]],
-    proposal_year: int,
-    proposal_code: str,
-    warnings: list[str],
-) -> None:
+def fill_revision_dates(revisions: list[InferredRevision], proposal_year: int) -> date | None:
+    """Fills missing revision dates in place; returns the base date when none was known."""
     if not revisions:
-        return
+        return None
 
-    known_indexes = [idx for idx, revision in enumerate(revisions) if revision["date"] is not None]
+    known_indexes = [idx for idx, revision in enumerate(revisions) if revision.date is not None]
 
     if not known_indexes:
         base = date(proposal_year, 1, 1)
         for idx, revision in enumerate(revisions):
-            revision["date"] = base + timedelta(days=idx)
-        warnings.append(
-            f"No revision dates in source, fallback applied: code={proposal_code}, base={base.isoformat()}"
-        )
-        return
+            revision.date = base + timedelta(days=idx)
+        return base
 
     for idx in range(1, len(revisions)):
-        if revisions[idx]["date"] is None and revisions[idx - 1]["date"] is not None:
-            revisions[idx]["date"] = revisions[idx - 1]["date"] + timedelta(days=1)
+        previous_date = revisions[idx - 1].date
+        if revisions[idx].date is None and previous_date is not None:
+            revisions[idx].date = previous_date + timedelta(days=1)
 
-    first_known = next((idx for idx, revision in enumerate(revisions) if revision["date"] is not None), None)
-    if first_known is not None and first_known > 0:
-        for idx in range(first_known - 1, -1, -1):
-            revisions[idx]["date"] = revisions[idx + 1]["date"] - timedelta(days=1)
+    first_known = known_indexes[0]
+    for idx in range(first_known - 1, -1, -1):
+        revisions[idx].date = revisions[idx + 1].date - timedelta(days=1)  # type: ignore[operator]
 
     for idx, revision in enumerate(revisions):
-        if revision["date"] is None:
-            anchor = revisions[idx - 1]["date"] if idx > 0 else date(proposal_year, 1, 1)
-            revision["date"] = anchor + timedelta(days=1)
+        if revision.date is None:
+            anchor = revisions[idx - 1].date if idx > 0 else date(proposal_year, 1, 1)
+            revision.date = anchor + timedelta(days=1)  # type: ignore[operator]
+    return None
 
 
-def extract_records(
-    xlsx_path: Path,
-) -> tuple[
-    list[CustomerRecord],
-    list[ProposalRecord],
-    list[ProposalRevisionRecord],
-    list[str],
-    dict[str, int],
-    dict[str, int],
-]:
-    workbook = openpyxl.load_workbook(xlsx_path, data_only=True)
-
-    customer_sheets = [sheet for sheet in workbook.sheetnames if sheet not in SKIP_SHEETS]
-    slug_by_sheet: dict[str, str] = {}
-    used_slugs: set[str] = set()
+WARNING_KINDS = {
+    "description_autofilled": "Missing description auto-filled",
+    "won_and_lost": "Both won/lost populated, won prioritized",
+    "synthetic_r0": "No explicit revisions found, synthetic R0 created",
+    "synthetic_r0_null": "No revision values in source, synthetic R0 with null value created",
+    "dates_fallback": "No revision dates in source, fallback applied",
+    "duplicate_code": "Duplicate proposal code, discarded to quarantine",
+}
+WARNING_SAMPLE_PER_KIND = 5
+
+
+@dataclass(frozen=True)
+class WarningEvent:
+    kind: str
+    sheet: str
+    row: int | None
+    code: str
+    detail: str = ""
 
-    customers: list[CustomerRecord] = []
-    for sheet in customer_sheets:
-        slug = unique_slug(slugify(sheet), used_slugs)
-        slug_by_sheet[sheet] = slug
-        customers.append(
-            CustomerRecord(
-                name=sheet,
-                slug=slug,
-                notes=f'Imported from legacy workbook "{xlsx_path.name}" (sheet "{sheet}").',
-            )
-        )
 
+@dataclass
+class SheetResult:
+    sheet: str
+    proposals: list[ProposalRecord]
+    revisions: list[ProposalRevisionRecord]
+    warnings: list[WarningEvent]
+    fingerprint: str = ""
+    reused: bool = False
+    layout: str = ""
+    mapping: SheetMapping | None = None
+    profile: SheetProfile | None = None
+
+
+def parse_sheet(
+    sheet: str,
+    customer_slug: str,
+    mapping: SheetMapping,
+    rows: Iterable[tuple[int, Sequence[object]]],
+) -> SheetResult:
     proposals: list[ProposalRecord] = []
     proposal_revisions: list[ProposalRevisionRecord] = []
-    warnings: list[str] = []
-    proposals_by_sheet: dict[str, int] = {sheet: 0 for sheet in customer_sheets}
-    revisions_by_sheet: dict[str, int] = {sheet: 0 for sheet in customer_sheets}
-
-    for sheet in customer_sheets:
-        worksheet = workbook[sheet]
-        mapping = extract_sheet_mapping(worksheet)
-        customer_slug = slug_by_sheet[sheet]
-
-        for row in range(5, worksheet.max_row + 1):
-            raw_code = normalize_str(worksheet.cell(row=row, column=2).value)
-            if not raw_code:
-                continue
+    warnings: list[WarningEvent] = []
+    revisions_from_row = PROFILER.timed("revision_inference", parse_revisions_from_row)
+    fill_dates = PROFILER.timed("revision_inference", fill_revision_dates)
 
-            match = PROPOSAL_CODE_RE.match(raw_code)
-            if not match:
-                continue
+    for row, values in rows:
+        raw_code = normalize_str(cell_value(values, 2))
+        if not raw_code:
+            continue
 
-            _, year_raw, seq_raw = match.groups()
-            year = int(year_raw)
-            seq_number = int(seq_raw)
+        match = PROPOSAL_CODE_RE.match(raw_code)
+        if not match:
+            continue
 
-            invitation_code = ""
-            if mapping.invitation_col is not None:
-                invitation_code = normalize_str(
-                    worksheet.cell(row=row, column=mapping.invitation_col).value
-                )
+        _, year_raw, seq_raw = match.groups()
+        year = int(year_raw)
+        seq_number = int(seq_raw)
 
-            description = ""
-            if mapping.description_col is not None:
-                description = normalize_str(
-                    worksheet.cell(row=row, column=mapping.description_col).value
-                )
-            if not description:
-                description = f"Legacy proposal {raw_code}"
-                warnings.append(
-                    f"Missing description auto-filled: sheet={sheet}, row={row}, code={raw_code}"
-                )
+        invitation_code = ""
+        if mapping.invitation_col is not None:
+            invitation_code = normalize_str(cell_value(values, mapping.invitation_col))
 
-            active_value = None
-            if mapping.active_col is not None:
-                active_value = parse_decimal(worksheet.cell(row=row, column=mapping.active_col).value)
+        description = ""
+        if mapping.description_col is not None:
+            description = normalize_str(cell_value(values, mapping.description_col))
+        if not description:
+            description = f"Legacy proposal {raw_code}"
+            warnings.append(WarningEvent("description_autofilled", sheet, row, raw_code))
 
-            won_value = None
-            if mapping.won_col is not None:
-                won_value = parse_decimal(worksheet.cell(row=row, column=mapping.won_col).value)
+        active_value = None
+        if mapping.active_col is not None:
+            active_value = VALUE_PARSER.parse_decimal(cell_value(values, mapping.active_col))
 
-            lost_value = None
-            if mapping.lost_col is not None:
-                lost_value = parse_decimal(worksheet.cell(row=row, column=mapping.lost_col).value)
+        won_value = None
+        if mapping.won_col is not None:
+            won_value = VALUE_PARSER.parse_decimal(cell_value(values, mapping.won_col))
 
-            if won_value is not None and lost_value is not None:
-                warnings.append(
-                    f"Both won/lost populated, won prioritized: sheet={sheet}, row={row}, code={raw_code}"
-                )
+        lost_value = None
+        if mapping.lost_col is not None:
+            lost_value = VALUE_PARSER.parse_decimal(cell_value(values, mapping.lost_col))
+
+        if won_value is not None and lost_value is not None:
+            warnings.append(WarningEvent("won_and_lost", sheet, row, raw_code))
+
+        if won_value is not None:
+            status = "ganha"
+            final_value = won_value
+            outcome_reason = ""
+        elif lost_value is not None:
+            status = "perdida"
+            final_value = lost_value
+            outcome_reason = ""
+        else:
+            status = "enviada"
+            final_value = None
+            outcome_reason = ""
 
-            if won_value is not None:
-                status = "ganha"
-                final_value = won_value
-                outcome_reason = ""
-            elif lost_value is not None:
-                status = "perdida"
-                final_value = lost_value
-                outcome_reason = ""
-            else:
-                status = "enviada"
-                final_value = None
-                outcome_reason = ""
-
-            row_revisions = parse_revisions_from_row(worksheet, row, mapping)
-
-            if not row_revisions:
-                fallback_value = pick_first(active_value, won_value, lost_value)
-                row_revisions = [
-                    {
-                        "label": 0,
-                        "value_col": mapping.active_col or 0,
-                        "value": fallback_value,
-                        "date": None,
-                    }
-                ]
-                if fallback_value is not None:
-                    warnings.append(
-                        f"No explicit revisions found, synthetic R0 created: sheet={sheet}, row={row}, code={raw_code}"
-                    )
-                else:
-                    warnings.append(
-                        f"No revision values in source, synthetic R0 with null value created: sheet={sheet}, row={row}, code={raw_code}"
-                    )
+        row_revisions = revisions_from_row(values, mapping)
 
-            row_revisions.sort(key=lambda item: int(item["value_col"]))
-
-            fill_revision_dates(row_revisions, year, raw_code, warnings)
-
-            for index, revision in enumerate(row_revisions):
-                raw_value_after = revision["value"]
-                raw_value_before = row_revisions[index - 1]["value"] if index > 0 else None
-                value_after = Decimal(raw_value_after) if raw_value_after is not None else None  # type: ignore[arg-type]
-                value_before = Decimal(raw_value_before) if raw_value_before is not None else None  # type: ignore[arg-type]
-                revision_date = revision["date"]  # type: ignore[assignment]
-                proposal_revisions.append(
-                    ProposalRevisionRecord(
-                        proposal_code=raw_code,
-                        revision_number=index,
-                        value_before_brl=decimal_to_csv(value_before),
-                        value_after_brl=decimal_to_csv(value_after),
-                        reason="",
-                        scope_changes="",
-                        discount_brl="",
-                        discount_percent="",
-                        notes="",
-                        created_at=date_to_timestamp_csv(revision_date),
-                        legacy_sheet=sheet,
-                        legacy_row=row,
-                        legacy_revision_label=f"REV.{revision['label']}",
-                    )
-                )
+        if not row_revisions:
+            fallback_value = pick_first(active_value, won_value, lost_value)
+            row_revisions = [InferredRevision(0, mapping.active_col or 0, fallback_value, None)]
+            kind = "synthetic_r0" if fallback_value is not None else "synthetic_r0_null"
+            warnings.append(WarningEvent(kind, sheet, row, raw_code))
 
-            revision_values = [
-                Decimal(item["value"]) for item in row_revisions if item["value"] is not None
-            ]  # type: ignore[arg-type]
-            estimated_value = pick_first(
-                active_value,
-                revision_values[-1] if revision_values else None,
-                won_value,
-                lost_value,
+        row_revisions.sort(key=REVISION_COLUMN)
+
+        fallback_base = fill_dates(row_revisions, year)
+        if fallback_base is not None:
+            warnings.append(
+                WarningEvent("dates_fallback", sheet, row, raw_code, f"base={fallback_base.isoformat()}")
             )
 
-            revision_dates = [item["date"] for item in row_revisions]
-            created_at_date = min(revision_dates)
-            updated_at_date = max(revision_dates)
-
-            proposals.append(
-                ProposalRecord(
-                    customer_slug=customer_slug,
-                    code=raw_code,
-                    seq_number=seq_number,
-                    year=year,
-                    invitation_code=invitation_code,
-                    project_name=description,
-                    scope_description=description,
-                    status=status,
-                    estimated_value_brl=decimal_to_csv(estimated_value),
-                    final_value_brl=decimal_to_csv(final_value),
-                    outcome_reason=outcome_reason,
-                    created_at=date_to_timestamp_csv(created_at_date),
-                    updated_at=date_to_timestamp_csv(updated_at_date),
+        value_before = None
+        for index, revision in enumerate(row_revisions):
+            proposal_revisions.append(
+                ProposalRevisionRecord(
+                    proposal_code=raw_code,
+                    revision_number=index,
+                    value_before_brl=value_before,
+                    value_after_brl=revision.value,
+                    reason="",
+                    scope_changes="",
+                    discount_brl=None,
+                    discount_percent=None,
+                    notes="",
+                    created_at=revision.date,  # type: ignore[arg-type]
                     legacy_sheet=sheet,
                     legacy_row=row,
+                    legacy_revision_label=revision.label,
                 )
             )
+            value_before = revision.value
+
+        revision_values = [item.value for item in row_revisions if item.value is not None]
+        estimated_value = pick_first(
+            active_value,
+            revision_values[-1] if revision_values else None,
+            won_value,
+            lost_value,
+        )
 
-            proposals_by_sheet[sheet] += 1
-            revisions_by_sheet[sheet] += len(row_revisions)
-
-    code_counter = Counter([proposal.code for proposal in proposals])
-    duplicate_codes = sorted([code for code, amount in code_counter.items() if amount > 1])
-    if duplicate_codes:
-        warnings.append(f"Duplicate proposal codes found: {', '.join(duplicate_codes)}")
+        revision_dates = [item.date for item in row_revisions]
+        created_at_date = min(revision_dates)  # type: ignore[type-var]
+        updated_at_date = max(revision_dates)  # type: ignore[type-var]
+
+        proposals.append(
+            ProposalRecord(
+                customer_slug=customer_slug,
+                code=raw_code,
+                seq_number=seq_number,
+                year=year,
+                invitation_code=invitation_code,
+                project_name=description,
+                scope_description=description,
+                status=status,
+                estimated_value_brl=estimated_value,
+                final_value_brl=final_value,
+                outcome_reason=outcome_reason,
+                created_at=created_at_date,
+                updated_at=updated_at_date,
+                legacy_sheet=sheet,
+                legacy_row=row,
+            )
+        )
 
-    revision_counter = Counter(
-        [(revision.proposal_code, revision.revision_number) for revision in proposal_revisions]
+    return SheetResult(
+        sheet=sheet,
+        proposals=proposals,
+        revisions=proposal_revisions,
+        warnings=warnings,
     )
-    duplicate_revisions = [
-        f"{code}-R{revision_number}"
-        for (code, revision_number), amount in revision_counter.items()
-        if amount > 1
-    ]
-    if duplicate_revisions:
-        warnings.append(f"Duplicate revisions found: {', '.join(sorted(duplicate_revisions))}")
 
-    return (
-        customers,
-        proposals,
-        proposal_revisions,
-        warnings,
-        proposals_by_sheet,
-        revisions_by_sheet,
+
+def sheet_fingerprint(
+    sheet: str,
+    customer_slug: str,
+    mapping: SheetMapping,
+    rows: Iterable[tuple[int, Sequence[object]]],
+) -> str:
+    """Hashes everything the extracted records of a sheet depend on."""
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [SCRIPT_VERSION, sheet, customer_slug, sorted(mapping.headers.items())],
+            ensure_ascii=False,
+        ).encode("utf-8")
     )
+    for row, values in rows:
+        # Trailing empty cells depend on the engine's idea of the sheet width, not on content.
+        end = len(values)
+        while end and values[end - 1] is None:
+            end -= 1
+        if end:
+            digest.update(repr((row, tuple(values[:end]))).encode("utf-8"))
+    return digest.hexdigest()
 
 
-def write_customers_csv(path: Path, records: list[CustomerRecord]) -> None:
-    fieldnames = ["name", "slug", "status", "cnpj", "notes"]
-    with path.open("w", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
-        for record in records:
-            writer.writerow(
-                {
-                    "name": record.name,
-                    "slug": record.slug,
-                    "status": record.status,
-                    "cnpj": record.cnpj,
-                    "notes": record.notes,
-                }
-            )
+def record_values(record: Any) -> list[object]:
+    # Positional values serialize several times faster than dataclasses.asdict.
+    return [getattr(record, name) for name in record.__dataclass_fields__]
 
 
-def write_proposals_csv(path: Path, records: list[ProposalRecord]) -> None:
-    fieldnames = [
-        "customer_slug",
-        "code",
-        "seq_number",
-        "year",
-        "invitation_code",
-        "project_name",
-        "scope_description",
-        "status",
-        "estimated_value_brl",
-        "final_value_brl",
-        "outcome_reason",
-        "created_at",
-        "updated_at",
-        "legacy_sheet",
-        "legacy_row",
-    ]
-    with path.open("w", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
-        for record in records:
-            writer.writerow(
-                {
-                    "customer_slug": record.customer_slug,
-                    "code": record.code,
-                    "seq_number": record.seq_number,
-                    "year": record.year,
-                    "invitation_code": record.invitation_code,
-                    "project_name": record.project_name,
-                    "scope_description": record.scope_description,
-                    "status": record.status,
-                    "estimated_value_brl": record.estimated_value_brl,
-                    "final_value_brl": record.final_value_brl,
-                    "outcome_reason": record.outcome_reason,
-                    "created_at": record.created_at,
-                    "updated_at": record.updated_at,
-                    "legacy_sheet": record.legacy_sheet,
-                    "legacy_row": record.legacy_row,
-                }
-            )
+def json_value(value: object) -> object:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
 
 
-def write_revisions_csv(path: Path, records: list[ProposalRevisionRecord]) -> None:
-    fieldnames = [
-        "proposal_code",
-        "revision_number",
-        "value_before_brl",
-        "value_after_brl",
-        "reason",
-        "scope_changes",
-        "discount_brl",
-        "discount_percent",
-        "notes",
-        "created_at",
-        "legacy_sheet",
-        "legacy_row",
-        "legacy_revision_label",
-    ]
-    with path.open("w", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
-        for record in records:
-            writer.writerow(
-                {
-                    "proposal_code": record.proposal_code,
-                    "revision_number": record.revision_number,
-                    "value_before_brl": record.value_before_brl,
-                    "value_after_brl": record.value_after_brl,
-                    "reason": record.reason,
-                    "scope_changes": record.scope_changes,
-                    "discount_brl": record.discount_brl,
-                    "discount_percent": record.discount_percent,
-                    "notes": record.notes,
-                    "created_at": record.created_at,
-                    "legacy_sheet": record.legacy_sheet,
-                    "legacy_row": record.legacy_row,
-                    "legacy_revision_label": record.legacy_revision_label,
-                }
-            )
+def record_to_json(record: Any) -> list[object]:
+    return [json_value(getattr(record, name)) for name in record.__dataclass_fields__]
 
 
-def write_sql(
-    path: Path,
-    customers_csv: Path,
-    proposals_csv: Path,
-    revisions_csv: Path,
-) -> None:
-    sql = f"""\\set ON_ERROR_STOP on
-\\if :{{?created_by}}
-\\else
-\\echo 'Required parameter: -v created_by=<UUID>'
-\\quit 1
-\\endif
+def optional_decimal(value: str | None) -> Decimal | None:
+    return Decimal(value) if value is not None else None
 
-BEGIN;
 
-CREATE TEMP TABLE stg_customers (
-  name text,
-  slug text,
-  status text,
-  cnpj text,
-  notes text
-);
+# Decoders of the typed record fields, keyed by their annotation.
+JSON_DECODERS: dict[str, Callable[[Any], object]] = {
+    "Decimal | None": optional_decimal,
+    "date": date.fromisoformat,
+}
 
-CREATE TEMP TABLE stg_proposals (
-  customer_slug text,
-  code text,
-  seq_number integer,
-  year integer,
-  invitation_code text,
-  project_name text,
-  scope_description text,
-  status text,
-  estimated_value_brl text,
-  final_value_brl text,
-  outcome_reason text,
-  created_at text,
-  updated_at text,
-  legacy_sheet text,
-  legacy_row integer
-);
 
-CREATE TEMP TABLE stg_proposal_revisions (
-  proposal_code text,
-  revision_number integer,
-  value_before_brl text,
-  value_after_brl text,
-  reason text,
-  scope_changes text,
-  discount_brl text,
-  discount_percent text,
-  notes text,
-  created_at text,
-  legacy_sheet text,
-  legacy_row integer,
-  legacy_revision_label text
-);
+def record_from_json(record_type: type[Any], values: list[object]) -> Any:
+    decoders = [JSON_DECODERS.get(item.type) for item in record_type.__dataclass_fields__.values()]
+    return record_type(
+        *(decode(value) if decode is not None else value for decode, value in zip(decoders, values))
+    )
 
-\\copy stg_customers FROM '{customers_csv.as_posix()}' WITH (FORMAT csv, HEADER true, ENCODING 'UTF8');
-\\copy stg_proposals FROM '{proposals_csv.as_posix()}' WITH (FORMAT csv, HEADER true, ENCODING 'UTF8');
-\\copy stg_proposal_revisions FROM '{revisions_csv.as_posix()}' WITH (FORMAT csv, HEADER true, ENCODING 'UTF8');
 
-INSERT INTO customers (name, slug, cnpj, notes, status)
-SELECT
-  sc.name,
-  sc.slug,
-  NULLIF(sc.cnpj, ''),
+def sheet_result_to_json(result: SheetResult) -> dict[str, object]:
+    return {
+        "sheet": result.sheet,
+        "proposals": [record_to_json(record) for record in result.proposals],
+        "revisions": [record_to_json(record) for record in result.revisions],
+        "warnings": [record_values(event) for event in result.warnings],
+        "fingerprint": result.fingerprint,
+        "layout": result.layout,
+        "mapping": mapping_to_json(result.mapping) if result.mapping is not None else None,
+    }
+
+
+def sheet_result_from_json(data: dict[str, object]) -> SheetResult:
+    return SheetResult(
+        sheet=data["sheet"],  # type: ignore[arg-type]
+        proposals=[
+            record_from_json(ProposalRecord, values)
+            for values in data["proposals"]  # type: ignore[union-attr]
+        ],
+        revisions=[
+            record_from_json(ProposalRevisionRecord, values)
+            for values in data["revisions"]  # type: ignore[union-attr]
+        ],
+        warnings=[WarningEvent(*values) for values in data["warnings"]],  # type: ignore[union-attr]
+        fingerprint=data["fingerprint"],  # type: ignore[arg-type]
+        layout=data["layout"],  # type: ignore[arg-type]
+        mapping=mapping_from_json(data["mapping"]) if data["mapping"] is not None else None,  # type: ignore[arg-type]
+    )
+
+
+def write_json_atomic(path: Path, data: object) -> None:
+    temp_path = path.with_name(f"{path.name}.tmp")
+    temp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    temp_path.replace(path)
+
+
+@dataclass
+class SheetCache:
+    """Content-addressed store of extracted sheets kept in the output directory."""
+
+    output_dir: Path
+    # Fingerprint -> result of the sheets of the last run, in watch mode; skips the JSON decode.
+    memory: dict[str, SheetResult] | None = None
+    # Sheet signature -> fingerprint, so sheets whose stored parts did not change are not read.
+    signatures: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def directory(self) -> Path:
+        return self.output_dir / "cache"
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.output_dir / "manifest.json"
+
+    def load(self, fingerprint: str) -> SheetResult | None:
+        if self.memory is not None and fingerprint in self.memory:
+            return replace(self.memory[fingerprint], reused=True)
+        path = self.directory / f"{fingerprint}.json"
+        if not path.exists():
+            return None
+        result = sheet_result_from_json(json.loads(path.read_text(encoding="utf-8")))
+        if self.memory is not None:
+            self.memory[fingerprint] = result
+        result.reused = True
+        return result
+
+    def load_signed(self, signature: str) -> SheetResult | None:
+        if self.memory is None or signature not in self.signatures:
+            return None
+        return self.load(self.signatures[signature])
+
+    def sign(self, signature: str, fingerprint: str) -> None:
+        if self.memory is not None:
+            self.signatures[signature] = fingerprint
+
+    def store(self, result: SheetResult) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(self.directory / f"{result.fingerprint}.json", sheet_result_to_json(result))
+        if self.memory is not None:
+            self.memory[result.fingerprint] = result
+
+    def write_manifest(self, entries: list[tuple[Path, SheetResult]]) -> None:
+        manifest = {
+            "script_version": SCRIPT_VERSION,
+            "generated_at_utc": datetime.now(timezone.utc).isoformat(),
+            "sheets": [
+                {
+                    "input_file": xlsx_path.as_posix(),
+                    "sheet": result.sheet,
+                    "fingerprint": result.fingerprint,
+                    "reused": result.reused,
+                }
+                for xlsx_path, result in entries
+            ],
+        }
+        write_json_atomic(self.manifest_path, manifest)
+
+        # Drop records of sheets that no longer exist in this form.
+        current = {f"{result.fingerprint}.json" for _, result in entries}
+        for path in self.directory.glob("*.json"):
+            if path.name not in current:
+                path.unlink()
+        if self.memory is not None:
+            for fingerprint in set(self.memory) - {result.fingerprint for _, result in entries}:
+                del self.memory[fingerprint]
+            self.signatures = {
+                signature: fingerprint
+                for signature, fingerprint in self.signatures.items()
+                if fingerprint in self.memory
+            }
+
+
+def write_layouts_report(path: Path, entries: list[tuple[Path, SheetResult]]) -> int:
+    """Writes every distinct sheet layout with the sheets using it; returns the layout count.
+
+    The report doubles as the persisted MappingCache of the next run. Layouts are listed from
+    the most to the least used, so a tab that drifted from the common layouts stands out.
+    """
+    layouts: dict[str, dict[str, Any]] = {}
+    for xlsx_path, result in entries:
+        if result.mapping is None:
+            continue
+        layout = layouts.setdefault(
+            result.layout,
+            {"signature": result.layout, "mapping": mapping_to_json(result.mapping), "sheets": []},
+        )
+        layout["sheets"].append({"input_file": xlsx_path.as_posix(), "sheet": result.sheet})
+
+    report = {
+        "script_version": SCRIPT_VERSION,
+        "generated_at_utc": datetime.now(timezone.utc).isoformat(),
+        "layouts": sorted(layouts.values(), key=lambda layout: -len(layout["sheets"])),
+    }
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return len(layouts)
+
+
+def extract_sheet(
+    source: WorkbookSource,
+    sheet: str,
+    customer_slug: str,
+    cache: SheetCache | None = None,
+) -> SheetResult:
+    signature = None
+    if cache is not None and cache.memory is not None:
+        signature = source.sheet_signature(sheet)
+        if signature is not None:
+            signature = f"{signature}:{customer_slug}"
+            cached = cache.load_signed(signature)
+            if cached is not None:
+                return cached
+
+    header_values, rows = source.read_sheet(sheet, sheet_columns)
+    with PROFILER.stage("mapping"):
+        layout, mapping = SHEET_MAPPINGS.resolve(header_values)
+
+    fingerprint = ""
+    if cache is not None:
+        with PROFILER.stage("fingerprint"):
+            fingerprint = sheet_fingerprint(sheet, customer_slug, mapping, rows)
+            cached = cache.load(fingerprint)
+        if signature is not None:
+            cache.sign(signature, fingerprint)
+        if cached is not None:
+            return cached
+        # The fingerprint pass consumed the rows, so the sheet is read a second time.
+        _, rows = source.read_sheet(sheet, sheet_columns)
+
+    with PROFILER.stage("row_parsing"):
+        result = parse_sheet(sheet, customer_slug, mapping, rows)
+    result.layout = layout
+    result.mapping = mapping
+
+    if cache is not None:
+        result.fingerprint = fingerprint
+        cache.store(result)
+    return result
+
+
+@dataclass
+class WorkbookCounts:
+    input_path: Path
+    proposals_by_sheet: dict[str, int]
+    revisions_by_sheet: dict[str, int]
+
+
+@dataclass
+class CheckpointStore:
+    """Per-sheet results written as each sheet completes, so a crashed run can resume."""
+
+    output_dir: Path
+
+    @property
+    def directory(self) -> Path:
+        return self.output_dir / "checkpoints"
+
+    def start(self, xlsx_paths: Sequence[Path], *, resume: bool) -> None:
+        run = {
+            "script_version": SCRIPT_VERSION,
+            "inputs": [
+                [path.as_posix(), path.stat().st_size, path.stat().st_mtime_ns]
+                for xlsx_path in xlsx_paths
+                for path in input_files(xlsx_path)
+            ],
+        }
+        run_path = self.directory / "run.json"
+        if resume and run_path.exists():
+            if json.loads(run_path.read_text(encoding="utf-8")) != run:
+                raise SystemExit(
+                    f"Checkpoints in {self.directory} belong to other inputs or script version; "
+                    "run without --resume to start over"
+                )
+            return
+
+        self.clear()
+        self.directory.mkdir(parents=True)
+        write_json_atomic(run_path, run)
+
+    def path_for(self, task: SheetTask) -> Path:
+        return self.directory / f"{task.index:05d}-{task.customer_slug}.json"
+
+    def has(self, task: SheetTask) -> bool:
+        return self.path_for(task).exists()
+
+    def load(self, task: SheetTask) -> SheetResult:
+        return sheet_result_from_json(json.loads(self.path_for(task).read_text(encoding="utf-8")))
+
+    def store(self, task: SheetTask, result: SheetResult) -> None:
+        write_json_atomic(self.path_for(task), sheet_result_to_json(result))
+
+    def clear(self) -> None:
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+
+
+@dataclass
+class SheetTask:
+    xlsx_path: Path
+    engine: str
+    sheet: str
+    customer_slug: str
+    index: int
+    cache: SheetCache | None = None
+    checkpoints: CheckpointStore | None = None
+    profile: bool = False
+
+
+def run_sheet_task(task: SheetTask, source: WorkbookSource) -> SheetResult:
+    started = time.perf_counter()
+    result = extract_sheet(source, task.sheet, task.customer_slug, task.cache)
+    if PROFILER.enabled:
+        # Reused sheets were not read, so their row count means nothing.
+        rows = 0 if result.reused else PROFILER.rows
+        result.profile = SheetProfile(rows, time.perf_counter() - started, PROFILER.drain())
+    # Cache hits are found again on resume, so only freshly parsed sheets are checkpointed.
+    if task.checkpoints is not None and not result.reused:
+        task.checkpoints.store(task, result)
+    return result
+
+
+# Per-process workbook handles, so each pool worker opens a given workbook only once.
+_WORKER_SOURCES: dict[tuple[Path, str], WorkbookSource] = {}
+
+
+def _run_sheet_task_in_worker(task: SheetTask) -> SheetResult:
+    PROFILER.enabled = task.profile
+    source = _WORKER_SOURCES.get((task.xlsx_path, task.engine))
+    if source is None:
+        source = WorkbookSource(task.xlsx_path, engine=task.engine)
+        _WORKER_SOURCES[(task.xlsx_path, task.engine)] = source
+    return run_sheet_task(task, source)
+
+
+def assign_customers(
+    xlsx_path: Path,
+    sheetnames: Sequence[str],
+    used_slugs: set[str],
+) -> tuple[list[CustomerRecord], list[tuple[str, str]]]:
+    """Assigns a unique slug to every customer sheet; `used_slugs` is shared across workbooks."""
+    customers: list[CustomerRecord] = []
+    sheets: list[tuple[str, str]] = []
+    for sheet in sheetnames:
+        if sheet in SKIP_SHEETS:
+            continue
+        slug = unique_slug(slugify(sheet), used_slugs)
+        sheets.append((sheet, slug))
+        customers.append(
+            CustomerRecord(
+                name=sheet,
+                slug=slug,
+                notes=f'Imported from legacy workbook "{xlsx_path.name}" (sheet "{sheet}").',
+            )
+        )
+    return customers, sheets
+
+
+def plan_extraction(
+    xlsx_paths: Sequence[Path],
+    *,
+    engine: str = "xml",
+    cache: SheetCache | None = None,
+    checkpoints: CheckpointStore | None = None,
+    profile: bool = False,
+) -> tuple[list[CustomerRecord], list[SheetTask]]:
+    used_slugs: set[str] = set()
+    customers: list[CustomerRecord] = []
+    tasks: list[SheetTask] = []
+    for xlsx_path in xlsx_paths:
+        # Only the sheet names are needed here, which a read-only open gives cheaply.
+        source = WorkbookSource(xlsx_path, engine=engine if engine != "full" else "streaming")
+        sheetnames = source.sheetnames
+        source.close()
+
+        # Slugs and indexes are assigned before checkpoints are consulted, so a resumed run
+        # names customers and orders warnings exactly like an uninterrupted one.
+        workbook_customers, sheets = assign_customers(xlsx_path, sheetnames, used_slugs)
+        customers.extend(workbook_customers)
+        for sheet, slug in sheets:
+            tasks.append(
+                SheetTask(
+                    xlsx_path,
+                    engine,
+                    sheet,
+                    slug,
+                    len(tasks),
+                    cache,
+                    checkpoints,
+                    profile,
+                )
+            )
+    return customers, tasks
+
+
+def _run_sheet_tasks(tasks: Iterable[SheetTask]) -> Iterator[SheetResult]:
+    """Runs tasks in this process, keeping one workbook open at a time."""
+    source: WorkbookSource | None = None
+    try:
+        for task in tasks:
+            if source is None or source.path != task.xlsx_path:
+                if source is not None:
+                    source.close()
+                source = WorkbookSource(task.xlsx_path, engine=task.engine)
+            yield run_sheet_task(task, source)
+    finally:
+        if source is not None:
+            source.close()
+
+
+def _in_task_order(
+    tasks: list[SheetTask],
+    finished: set[int],
+    fresh: Iterator[SheetResult],
+) -> Iterator[tuple[SheetTask, SheetResult]]:
+    for task in tasks:
+        if task.index in finished:
+            result = task.checkpoints.load(task)  # type: ignore[union-attr]
+        else:
+            result = next(fresh)
+        yield task, result  # type: ignore[misc]
+
+
+def extract_records(
+    tasks: list[SheetTask],
+    *,
+    workers: int = 1,
+) -> Iterator[tuple[SheetTask, SheetResult]]:
+    """Yields the records of every sheet in task order, one sheet at a time."""
+    finished = {
+        task.index
+        for task in tasks
+        if task.checkpoints is not None and task.checkpoints.has(task)
+    }
+    pending = [task for task in tasks if task.index not in finished]
+
+    # Results come back in task order, so the output does not depend on the worker count.
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from _in_task_order(
+                tasks, finished, executor.map(_run_sheet_task_in_worker, pending)
+            )
+    else:
+        yield from _in_task_order(tasks, finished, _run_sheet_tasks(pending))
+
+
+# Validation reads the proposal codes only.
+CODE_COLUMNS = ColumnSelection(frozenset({2}))
+VALIDATION_SAMPLE = 20
+
+
+def mapping_is_usable(mapping: SheetMapping) -> bool:
+    """A mapping without any value column turns every proposal into a valueless synthetic R0."""
+    return bool(mapping.rev_value_cols) or any(
+        col is not None for col in (mapping.active_col, mapping.won_col, mapping.lost_col)
+    )
+
+
+@dataclass
+class SheetValidation:
+    xlsx_path: Path
+    sheet: str
+    layout: str
+    usable: bool
+    # Rows whose column B matches PROPOSAL_CODE_RE, and non-empty ones that do not.
+    proposal_rows: int = 0
+    other_codes: int = 0
+
+
+@dataclass
+class ValidationReport:
+    sheets: list[SheetValidation] = field(default_factory=list)
+    # code -> (workbook, sheet, row) of every row carrying it.
+    codes: dict[str, list[tuple[Path, str, int]]] = field(default_factory=dict)
+
+    @property
+    def duplicates(self) -> dict[str, list[tuple[Path, str, int]]]:
+        return {code: rows for code, rows in self.codes.items() if len(rows) > 1}
+
+
+def validate_sheet(
+    source: WorkbookSource, task: SheetTask, report: ValidationReport
+) -> SheetValidation:
+    header_values, rows = source.read_sheet(task.sheet, lambda header: CODE_COLUMNS)
+    layout, mapping = SHEET_MAPPINGS.resolve(header_values)
+    validation = SheetValidation(task.xlsx_path, task.sheet, layout, mapping_is_usable(mapping))
+    for row, values in rows:
+        raw_code = normalize_str(cell_value(values, 2))
+        if not raw_code:
+            continue
+        if not PROPOSAL_CODE_RE.match(raw_code):
+            validation.other_codes += 1
+            continue
+        validation.proposal_rows += 1
+        report.codes.setdefault(raw_code, []).append((task.xlsx_path, task.sheet, row))
+    return validation
+
+
+def validate_records(tasks: list[SheetTask]) -> ValidationReport:
+    """Checks codes, mappings and duplicates without parsing values or writing anything."""
+    report = ValidationReport()
+    source: WorkbookSource | None = None
+    try:
+        for task in tasks:
+            if source is None or source.path != task.xlsx_path:
+                if source is not None:
+                    source.close()
+                # Only headers and codes are read, so workbooks always get the cheap xml
+                # reader (itself falling back to openpyxl streaming), never a full load.
+                engine = "csv" if task.engine == "csv" else "xml"
+                source = WorkbookSource(task.xlsx_path, engine=engine)
+            report.sheets.append(validate_sheet(source, task, report))
+    finally:
+        if source is not None:
+            source.close()
+    return report
+
+
+def print_validation_report(report: ValidationReport) -> None:
+    unusable = [item for item in report.sheets if not item.usable]
+    duplicates = report.duplicates
+    print(f"- sheets: {len(report.sheets)} ({len(unusable)} without a usable mapping)")
+    print(f"- proposal rows: {sum(item.proposal_rows for item in report.sheets)}")
+    print(
+        "- other non-empty codes: "
+        f"{sum(item.other_codes for item in report.sheets)} (not matching BV-XXX-YYYY-BIM-NNNN)"
+    )
+    print(f"- distinct codes: {len(report.codes)}")
+    print(f"- duplicate codes: {len(duplicates)}")
+    for code, rows in list(duplicates.items())[:VALIDATION_SAMPLE]:
+        places = ", ".join(f"{path.name}:{sheet}:{row}" for path, sheet, row in rows)
+        print(f"  - {code}: {places}")
+    if len(duplicates) > VALIDATION_SAMPLE:
+        print(f"  - ... and {len(duplicates) - VALIDATION_SAMPLE} more")
+    for item in unusable:
+        print(
+            f"- no usable mapping: {item.xlsx_path.name} sheet {item.sheet!r} "
+            f"(layout {item.layout}, {item.proposal_rows} proposal rows)"
+        )
+
+
+@dataclass
+class IndexedProposal:
+    """Where the kept proposal of a code came from, and what it added to the totals."""
+
+    xlsx_path: Path
+    sheet: str
+    row: int
+    updated_at: date
+    status: str
+    customer_slug: str
+    revisions: int
+    # 1-based position among the proposals of its code written to the outputs; 0 until written.
+    occurrence: int = 0
+
+
+@dataclass
+class Admission:
+    proposals: list[ProposalRecord]
+    revisions: list[ProposalRevisionRecord]
+    quarantined_proposals: list[ProposalRecord]
+    quarantined_revisions: list[ProposalRevisionRecord]
+    # Proposals of earlier sheets, already written, that lost to one of this sheet.
+    evicted: list[IndexedProposal]
+    events: list[tuple[WarningEvent, Path]]
+
+
+class DuplicateCodeError(Exception):
+    """A proposal code was seen twice and the duplicate policy is fail-fast."""
+
+
+class DuplicateIndex:
+    """Keeps one proposal per code as sheets arrive, applying the duplicate policy."""
+
+    def __init__(self, policy: str = "first-wins") -> None:
+        self.policy = policy
+        self.kept: dict[str, IndexedProposal] = {}
+        self.written: Counter[str] = Counter()
+        # (code, occurrence) of written proposals that were discarded afterwards.
+        self.evicted: set[tuple[str, int]] = set()
+
+    def admit(self, xlsx_path: Path, result: SheetResult) -> Admission:
+        revisions_by_proposal: dict[tuple[str, int], list[ProposalRevisionRecord]] = {}
+        for revision in result.revisions:
+            key = (revision.proposal_code, revision.legacy_row)
+            revisions_by_proposal.setdefault(key, []).append(revision)
+
+        admission = Admission([], [], [], [], [], [])
+        # code -> proposal of this sheet currently kept; nothing of it is written yet.
+        pending: dict[str, ProposalRecord] = {}
+        for proposal in result.proposals:
+            revisions = revisions_by_proposal.get((proposal.code, proposal.legacy_row), [])
+            entry = IndexedProposal(
+                xlsx_path,
+                proposal.legacy_sheet,
+                proposal.legacy_row,
+                proposal.updated_at,
+                proposal.status,
+                proposal.customer_slug,
+                len(revisions),
+            )
+            kept = self.kept.get(proposal.code)
+            if kept is None:
+                self.kept[proposal.code] = entry
+                pending[proposal.code] = proposal
+                continue
+
+            if self.policy == "fail-fast":
+                raise DuplicateCodeError(
+                    f"Duplicate proposal code {proposal.code}: {xlsx_path.name} sheet "
+                    f"{proposal.legacy_sheet!r} row {proposal.legacy_row}, first seen in "
+                    f"{kept.xlsx_path.name} sheet {kept.sheet!r} row {kept.row}"
+                )
+            # Ties keep the proposal extracted first.
+            replaces = self.policy == "last-wins" or (
+                self.policy == "latest-updated-wins" and proposal.updated_at > kept.updated_at
+            )
+            if not replaces:
+                admission.quarantined_proposals.append(proposal)
+                admission.quarantined_revisions.extend(revisions)
+                discarded, winner = entry, kept
+            else:
+                self.kept[proposal.code] = entry
+                loser = pending.pop(proposal.code, None)
+                if loser is not None:
+                    admission.quarantined_proposals.append(loser)
+                    admission.quarantined_revisions.extend(
+                        revisions_by_proposal.get((loser.code, loser.legacy_row), [])
+                    )
+                else:
+                    self.evicted.add((proposal.code, kept.occurrence))
+                    admission.evicted.append(kept)
+                pending[proposal.code] = proposal
+                discarded, winner = kept, entry
+            admission.events.append(
+                (
+                    WarningEvent(
+                        "duplicate_code",
+                        discarded.sheet,
+                        discarded.row,
+                        proposal.code,
+                        f"policy={self.policy}, kept={winner.xlsx_path.name}:{winner.sheet}:{winner.row}",
+                    ),
+                    discarded.xlsx_path,
+                )
+            )
+
+        # Records stay in sheet order; revisions follow their proposal.
+        for proposal in result.proposals:
+            if pending.get(proposal.code) is not proposal:
+                continue
+            self.written[proposal.code] += 1
+            self.kept[proposal.code].occurrence = self.written[proposal.code]
+            admission.proposals.append(proposal)
+            admission.revisions.extend(
+                revisions_by_proposal.get((proposal.code, proposal.legacy_row), [])
+            )
+        return admission
+
+
+def compact_table(
+    path: Path,
+    quarantine_path: Path,
+    code_field: str,
+    evicted: set[tuple[str, int]],
+) -> None:
+    """Moves the rows of evicted proposals from a written CSV to its quarantine file.
+
+    Only last-wins and latest-updated-wins evict proposals that were already written. Rows
+    are matched by their code's occurrence, counted the way DuplicateIndex counted them; a
+    revision row starts a new occurrence at revision 0.
+    """
+    # The temporary file keeps the compression suffix, so it is compressed the same way.
+    temp_path = path.with_name(f"{path.stem}.tmp{path.suffix}")
+    occurrences: Counter[str] = Counter()
+    with ExitStack() as stack:
+        source = stack.enter_context(open_output(path))
+        kept_file = stack.enter_context(open_output(temp_path, "w"))
+        quarantine_file = stack.enter_context(open_output(quarantine_path, "a"))
+        reader = csv.reader(source)
+        kept = csv.writer(kept_file)
+        quarantine = csv.writer(quarantine_file)
+        fieldnames = next(reader)
+        kept.writerow(fieldnames)
+        code_index = fieldnames.index(code_field)
+        revision_index = (
+            fieldnames.index("revision_number") if "revision_number" in fieldnames else None
+        )
+        for row in reader:
+            code = row[code_index]
+            if revision_index is None or row[revision_index] == "0":
+                occurrences[code] += 1
+            (quarantine if (code, occurrences[code]) in evicted else kept).writerow(row)
+    temp_path.replace(path)
+
+
+REBUILD_CHUNK_ROWS = 50_000
+
+
+def rebuild_from_csv(csv_path: Path, writer: BinaryCopyWriter | ParquetTableWriter) -> None:
+    """Writes the rows of a CSV output again through a binary COPY or Parquet writer.
+
+    Parquet row groups then hold REBUILD_CHUNK_ROWS rows instead of one sheet each.
+    """
+    with open_output(csv_path) as source, writer:
+        reader = csv.reader(source)
+        next(reader)
+        while chunk := list(islice(reader, REBUILD_CHUNK_ROWS)):
+            writer.write(chunk)
+
+
+def shard_path(path: Path, shard: int) -> Path:
+    base = uncompressed_path(path)
+    return path.with_name(f"{base.stem}.shard{shard:02d}{base.suffix}{compression_suffix(path)}")
+
+
+def shard_of(code: str, shards: int) -> int:
+    """1-based shard of a proposal code; crc32 keeps it stable across runs and machines."""
+    return zlib.crc32(code.encode("utf-8")) % shards + 1
+
+
+def remove_shards(path: Path) -> None:
+    """Deletes the shard files of path left by an earlier run, whatever their count.
+
+    Shards written with any compression go, not only those matching path's.
+    """
+    base = uncompressed_path(path)
+    for suffix in COMPRESSIONS.values():
+        pattern = f"{glob.escape(base.stem)}.shard[0-9][0-9]*{base.suffix}{suffix}"
+        for shard in path.parent.glob(pattern):
+            shard.unlink()
+
+
+def shard_table(
+    csv_path: Path,
+    code_field: str,
+    column_types: dict[str, str],
+    shards: int,
+    *,
+    binary: bool = False,
+) -> None:
+    """Splits a CSV output into shards by code, so a proposal and its revisions share one.
+
+    Rows keep their order within each shard. With binary, the .pgcopy of every shard is
+    written in the same pass.
+    """
+    with ExitStack() as stack:
+        source = stack.enter_context(open_output(csv_path))
+        reader = csv.reader(source)
+        fieldnames = next(reader)
+        code_index = fieldnames.index(code_field)
+        writers: list[list[Any]] = [
+            [stack.enter_context(CsvTableWriter(shard_path(csv_path, shard), fieldnames, list))]
+            for shard in range(1, shards + 1)
+        ]
+        if binary:
+            for shard, shard_writers in enumerate(writers, start=1):
+                shard_writers.append(
+                    stack.enter_context(
+                        BinaryCopyWriter(
+                            shard_path(sibling_output(csv_path, ".pgcopy"), shard),
+                            column_types,
+                            list,
+                        )
+                    )
+                )
+        while chunk := list(islice(reader, REBUILD_CHUNK_ROWS)):
+            rows_by_shard: list[list[list[str]]] = [[] for _ in range(shards)]
+            for row in chunk:
+                rows_by_shard[shard_of(row[code_index], shards) - 1].append(row)
+            for shard_writers, rows in zip(writers, rows_by_shard):
+                for writer in shard_writers:
+                    writer.write(rows)
+
+
+class WarningLog:
+    """Streams warning events to a JSON Lines file, keeping only counts and a sample."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = path.open("w", encoding="utf-8")
+        self.counts: Counter[str] = Counter()
+        self.sample: list[dict[str, object]] = []
+
+    def write(self, events: Iterable[WarningEvent], input_file: Path | None = None) -> None:
+        input_name = input_file.name if input_file is not None else ""
+        for event in events:
+            entry = {
+                "kind": event.kind,
+                "message": WARNING_KINDS[event.kind],
+                "input_file": input_name,
+                "sheet": event.sheet,
+                "row": event.row,
+                "code": event.code,
+                "detail": event.detail,
+            }
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.counts[event.kind] += 1
+            if self.counts[event.kind] <= WARNING_SAMPLE_PER_KIND:
+                self.sample.append(entry)
+
+    def summary(self) -> dict[str, object]:
+        return {
+            "total": sum(self.counts.values()),
+            "by_kind": dict(self.counts.most_common()),
+            "file": self.path.name,
+            "sample": self.sample,
+        }
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> WarningLog:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+@dataclass
+class ExtractionTotals:
+    workbook_counts: list[WorkbookCounts]
+    proposals_total: int = 0
+    revisions_total: int = 0
+    proposals_by_status: Counter[str] = field(default_factory=Counter)
+    proposals_by_slug: Counter[str] = field(default_factory=Counter)
+    layouts_total: int = 0
+    quarantined: int = 0
+    # (task, profile, reused); the records themselves are not kept.
+    sheet_profiles: list[tuple[SheetTask, SheetProfile, bool]] = field(default_factory=list)
+    warnings: dict[str, object] = field(default_factory=dict)
+
+
+CUSTOMER_FIELDS = ["name", "slug", "status", "cnpj", "notes"]
+PROPOSAL_FIELDS = [
+    "customer_slug",
+    "code",
+    "seq_number",
+    "year",
+    "invitation_code",
+    "project_name",
+    "scope_description",
+    "status",
+    "estimated_value_brl",
+    "final_value_brl",
+    "outcome_reason",
+    "created_at",
+    "updated_at",
+    "legacy_sheet",
+    "legacy_row",
+    "row_hash",
+]
+REVISION_FIELDS = [
+    "proposal_code",
+    "revision_number",
+    "value_before_brl",
+    "value_after_brl",
+    "reason",
+    "scope_changes",
+    "discount_brl",
+    "discount_percent",
+    "notes",
+    "created_at",
+    "legacy_sheet",
+    "legacy_row",
+    "legacy_revision_label",
+    "row_hash",
+]
+
+# Content hashed into row_hash, with the SQL rebuilding the same text from a stored row, so
+# the import can skip rows whose stored values already match. NULLs are spelled as the empty
+# strings the CSV holds; timestamps are written as UTC like date_to_timestamp_csv.
+UTC_TIMESTAMP_SQL = "to_char({row}.%s AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS\"Z\"')"
+PROPOSAL_HASH_SQL = {
+    "code": "{row}.code",
+    "seq_number": "{row}.seq_number::text",
+    "year": "{row}.year::text",
+    "invitation_code": "coalesce({row}.invitation_code, '')",
+    "project_name": "{row}.project_name",
+    "scope_description": "{row}.scope_description",
+    "status": "{row}.status::text",
+    "estimated_value_brl": "coalesce({row}.estimated_value_brl::text, '')",
+    "final_value_brl": "coalesce({row}.final_value_brl::text, '')",
+    "outcome_reason": "coalesce({row}.outcome_reason, '')",
+    "created_at": UTC_TIMESTAMP_SQL % "created_at",
+    "updated_at": UTC_TIMESTAMP_SQL % "updated_at",
+}
+REVISION_HASH_SQL = {
+    "revision_number": "{row}.revision_number::text",
+    "reason": "coalesce({row}.reason, '')",
+    "scope_changes": "coalesce({row}.scope_changes, '')",
+    "discount_brl": "coalesce({row}.discount_brl::text, '')",
+    "discount_percent": "coalesce({row}.discount_percent::text, '')",
+    "value_before_brl": "coalesce({row}.value_before_brl::text, '')",
+    "value_after_brl": "coalesce({row}.value_after_brl::text, '')",
+    "notes": "coalesce({row}.notes, '')",
+    "created_at": UTC_TIMESTAMP_SQL % "created_at",
+}
+ROW_HASH_SEPARATOR = "\x1f"
+# Hashed values are taken from the formatted row, so they match the CSV text.
+proposal_hash_values = operator.itemgetter(*(PROPOSAL_FIELDS.index(name) for name in PROPOSAL_HASH_SQL))
+revision_hash_values = operator.itemgetter(*(REVISION_FIELDS.index(name) for name in REVISION_HASH_SQL))
+
+# PostgreSQL type of every exported column, as loaded by the binary COPY staging tables.
+CUSTOMER_COLUMN_TYPES = dict.fromkeys(CUSTOMER_FIELDS, "text")
+PROPOSAL_COLUMN_TYPES = {
+    **dict.fromkeys(PROPOSAL_FIELDS, "text"),
+    "seq_number": "integer",
+    "year": "integer",
+    "estimated_value_brl": "numeric(14, 2)",
+    "final_value_brl": "numeric(14, 2)",
+    "created_at": "timestamptz",
+    "updated_at": "timestamptz",
+    "legacy_row": "integer",
+    "row_hash": "text",
+}
+REVISION_COLUMN_TYPES = {
+    **dict.fromkeys(REVISION_FIELDS, "text"),
+    "revision_number": "integer",
+    "value_before_brl": "numeric(14, 2)",
+    "value_after_brl": "numeric(14, 2)",
+    "discount_brl": "numeric(14, 2)",
+    "discount_percent": "numeric(5, 2)",
+    "created_at": "timestamptz",
+    "legacy_row": "integer",
+    "row_hash": "text",
+}
+
+
+def row_hash(values: Iterable[object]) -> str:
+    text = ROW_HASH_SEPARATOR.join(map(str, values))
+    return hashlib.md5(text.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+
+def row_hash_sql(hash_sql: dict[str, str], row: str) -> str:
+    """SQL md5 of a stored row, equal to row_hash of the record it was imported from."""
+    parts = [expression.format(row=row) for expression in hash_sql.values()]
+    return "md5(\n      " + "\n      || chr(31) || ".join(parts) + "\n    )"
+
+
+def customer_row(record: CustomerRecord) -> list[object]:
+    return [record.name, record.slug, record.status, record.cnpj, record.notes]
+
+
+def proposal_row(record: ProposalRecord) -> list[object]:
+    row: list[object] = [
+        record.customer_slug,
+        record.code,
+        record.seq_number,
+        record.year,
+        record.invitation_code,
+        record.project_name,
+        record.scope_description,
+        record.status,
+        decimal_to_csv(record.estimated_value_brl),
+        decimal_to_csv(record.final_value_brl),
+        record.outcome_reason,
+        date_to_timestamp_csv(record.created_at),
+        date_to_timestamp_csv(record.updated_at),
+        record.legacy_sheet,
+        record.legacy_row,
+    ]
+    row.append(row_hash(proposal_hash_values(row)))
+    return row
+
+
+def revision_row(record: ProposalRevisionRecord) -> list[object]:
+    row: list[object] = [
+        record.proposal_code,
+        record.revision_number,
+        decimal_to_csv(record.value_before_brl),
+        decimal_to_csv(record.value_after_brl),
+        record.reason,
+        record.scope_changes,
+        decimal_to_csv(record.discount_brl),
+        decimal_to_csv(record.discount_percent),
+        record.notes,
+        date_to_timestamp_csv(record.created_at),
+        record.legacy_sheet,
+        record.legacy_row,
+        f"REV.{record.legacy_revision_label}",
+    ]
+    row.append(row_hash(revision_hash_values(row)))
+    return row
+
+
+DECOMPRESS_PROGRAMS = {".gz": "gzip -dc", ".zst": "zstd -dc"}
+# Fast levels: the outputs are compressed for the trip to the database host, not for archiving.
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def import_zstandard():  # type: ignore[no-untyped-def]
+    try:
+        import zstandard
+    except ModuleNotFoundError as exc:  # pragma: no cover
+        raise SystemExit(
+            "Missing dependency: zstandard. Install with: python3 -m pip install --user zstandard"
+        ) from exc
+    return zstandard
+
+
+def compression_suffix(path: Path) -> str:
+    return path.suffix if path.suffix in DECOMPRESS_PROGRAMS else ""
+
+
+def uncompressed_path(path: Path) -> Path:
+    return path.with_suffix("") if compression_suffix(path) else path
+
+
+def compressed_path(path: Path, compression: str) -> Path:
+    return path.with_name(path.name + COMPRESSIONS[compression])
+
+
+def sibling_output(path: Path, suffix: str) -> Path:
+    """path with another format suffix, keeping its compression: x.csv.gz -> x.pgcopy.gz.
+
+    Parquet compresses its own pages, so .parquet siblings are never compressed.
+    """
+    sibling = uncompressed_path(path).with_suffix(suffix)
+    if suffix == ".parquet":
+        return sibling
+    return sibling.with_name(sibling.name + compression_suffix(path))
+
+
+def find_output(path: Path) -> Path | None:
+    """The newest of path and its compressed variants, if any of them exists."""
+    candidates = [compressed_path(path, compression) for compression in COMPRESSIONS]
+    existing = [candidate for candidate in candidates if candidate.exists()]
+    return max(existing, key=lambda candidate: candidate.stat().st_mtime_ns, default=None)
+
+
+def open_output(path: Path, mode: str = "r") -> IO[Any]:
+    """Opens an output file, streaming it through the compression its suffix names.
+
+    Text modes are UTF-8 without newline translation, as the csv module expects. Appending
+    to a compressed file adds a new gzip member or zstd frame, which both tools read on.
+    """
+    compression = compression_suffix(path)
+    binary_mode = mode if "b" in mode else f"{mode}b"
+    stream: IO[Any]
+    if compression == ".gz":
+        stream = gzip.GzipFile(path, binary_mode, compresslevel=GZIP_LEVEL, mtime=0)
+    elif compression == ".zst":
+        zstandard = import_zstandard()
+        file = path.open(binary_mode)
+        if "r" in mode:
+            stream = zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True)
+        else:
+            stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(file)
+    else:
+        return path.open(mode, **({} if "b" in mode else {"newline": "", "encoding": "utf-8"}))
+    if "b" in mode:
+        return stream
+    return io.TextIOWrapper(stream, encoding="utf-8", newline="")
+
+
+class CsvTableWriter:
+    """Appends records to a CSV file as they are produced."""
+
+    def __init__(self, path: Path, fieldnames: list[str], to_row: Callable[[Any], list[object]]):
+        self.path = path
+        self.to_row = to_row
+        self.file = open_output(path, "w")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(fieldnames)
+
+    def write(self, records: Iterable[Any]) -> None:
+        to_row = self.to_row
+        self.writer.writerows(to_row(record) for record in records)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> CsvTableWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+PGCOPY_TRAILER = struct.pack(">h", -1)
+PGCOPY_NULL = struct.pack(">i", -1)
+PG_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def pgcopy_text(value: object) -> bytes:
+    if value is None:
+        return PGCOPY_NULL
+    data = str(value).encode("utf-8")
+    return struct.pack(">i", len(data)) + data
+
+
+def pgcopy_integer(value: object) -> bytes:
+    if value is None or value == "":
+        return PGCOPY_NULL
+    return struct.pack(">ii", 4, int(value))  # type: ignore[call-overload]
+
+
+@lru_cache(maxsize=65536)
+def pgcopy_numeric(value: str) -> bytes:
+    """Encodes a decimal string in PostgreSQL's base-10000 numeric wire format."""
+    if not value:
+        return PGCOPY_NULL
+    sign, digits, exponent = Decimal(value).as_tuple()
+    dscale = max(-exponent, 0)  # type: ignore[operator]
+    coefficient = int("".join(map(str, digits)))
+    # Align the exponent to a base-10000 digit boundary.
+    shift = exponent % 4  # type: ignore[operator]
+    coefficient *= 10**shift
+    exponent -= shift  # type: ignore[operator]
+
+    groups: list[int] = []
+    while coefficient:
+        coefficient, group = divmod(coefficient, 10000)
+        groups.append(group)
+    groups.reverse()
+    weight = len(groups) + exponent // 4 - 1  # type: ignore[operator]
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        # Zero, including "-0.00", is stored unsigned.
+        weight = 0
+        sign = 0
+
+    data = struct.pack(
+        f">hhHh{len(groups)}H", len(groups), weight, 0x4000 if sign else 0, dscale, *groups
+    )
+    return struct.pack(">i", len(data)) + data
+
+
+@lru_cache(maxsize=65536)
+def pgcopy_timestamptz(value: str) -> bytes:
+    if not value:
+        return PGCOPY_NULL
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return struct.pack(">iq", 8, (moment - PG_EPOCH) // timedelta(microseconds=1))
+
+
+PGCOPY_ENCODERS: dict[str, Callable[[Any], bytes]] = {
+    "text": pgcopy_text,
+    "integer": pgcopy_integer,
+    "numeric(14, 2)": pgcopy_numeric,
+    "numeric(5, 2)": pgcopy_numeric,
+    "timestamptz": pgcopy_timestamptz,
+}
+
+
+class BinaryCopyWriter:
+    """Appends records to a PostgreSQL binary COPY file as they are produced.
+
+    Text columns keep empty strings as they are, like the CSV files; typed columns turn them
+    into NULL.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        column_types: dict[str, str],
+        to_row: Callable[[Any], list[object]],
+    ):
+        self.path = path
+        self.to_row = to_row
+        self.encoders = [PGCOPY_ENCODERS[sql_type] for sql_type in column_types.values()]
+        self.field_count = struct.pack(">h", len(self.encoders))
+        self.file = open_output(path, "wb")
+        self.file.write(PGCOPY_HEADER)
+
+    def write(self, records: Iterable[Any]) -> None:
+        to_row = self.to_row
+        encoders = self.encoders
+        chunks = []
+        for record in records:
+            chunks.append(self.field_count)
+            chunks.extend(encode(value) for encode, value in zip(encoders, to_row(record)))
+        self.file.write(b"".join(chunks))
+
+    def close(self) -> None:
+        self.file.write(PGCOPY_TRAILER)
+        self.file.close()
+
+    def __enter__(self) -> BinaryCopyWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def import_pyarrow():  # type: ignore[no-untyped-def]
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ModuleNotFoundError as exc:  # pragma: no cover
+        raise SystemExit(
+            "Missing dependency for --format parquet: pyarrow. "
+            "Install with: python3 -m pip install --user pyarrow"
+        ) from exc
+    return pyarrow
+
+
+# Low-cardinality text columns stored as dictionaries, which readers load as categoricals.
+PARQUET_DICTIONARY_COLUMNS = {"customer_slug", "legacy_sheet"}
+
+
+def parquet_integer(value: object) -> int | None:
+    if value is None or value == "":
+        return None
+    return int(value)  # type: ignore[call-overload]
+
+
+@lru_cache(maxsize=65536)
+def parquet_decimal(value: str) -> Decimal | None:
+    return Decimal(value) if value else None
+
+
+@lru_cache(maxsize=65536)
+def parquet_timestamp(value: str) -> datetime | None:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+PARQUET_CONVERTERS: dict[str, Callable[[Any], object]] = {
+    "integer": parquet_integer,
+    "numeric(14, 2)": parquet_decimal,
+    "numeric(5, 2)": parquet_decimal,
+    "timestamptz": parquet_timestamp,
+}
+
+
+class ParquetTableWriter:
+    """Appends records to a typed Parquet file, one row group per write.
+
+    Takes the same rows as the CSV and binary COPY writers and converts the money, integer
+    and timestamp strings to decimal, int32 and UTC timestamp columns.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        column_types: dict[str, str],
+        to_row: Callable[[Any], list[object]],
+    ):
+        pyarrow = import_pyarrow()
+        arrow_types = {
+            "text": pyarrow.string(),
+            "integer": pyarrow.int32(),
+            "numeric(14, 2)": pyarrow.decimal128(14, 2),
+            "numeric(5, 2)": pyarrow.decimal128(5, 2),
+            "timestamptz": pyarrow.timestamp("us", tz="UTC"),
+        }
+        self.pyarrow = pyarrow
+        self.path = path
+        self.to_row = to_row
+        self.columns = [
+            (
+                arrow_types[sql_type],
+                PARQUET_CONVERTERS.get(sql_type),
+                name in PARQUET_DICTIONARY_COLUMNS,
+            )
+            for name, sql_type in column_types.items()
+        ]
+        self.schema = pyarrow.schema(
+            pyarrow.field(
+                name,
+                pyarrow.dictionary(pyarrow.int32(), arrow_type) if dictionary else arrow_type,
+            )
+            for name, (arrow_type, _, dictionary) in zip(column_types, self.columns)
+        )
+        self.writer = pyarrow.parquet.ParquetWriter(
+            path, self.schema, use_dictionary=sorted(PARQUET_DICTIONARY_COLUMNS & set(column_types))
+        )
+
+    def write(self, records: Iterable[Any]) -> None:
+        rows = [self.to_row(record) for record in records]
+        if not rows:
+            return
+        arrays = []
+        for (arrow_type, convert, dictionary), values in zip(self.columns, zip(*rows)):
+            if convert is not None:
+                values = tuple(map(convert, values))
+            array = self.pyarrow.array(values, type=arrow_type)
+            arrays.append(array.dictionary_encode() if dictionary else array)
+        self.writer.write_table(self.pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+    def __enter__(self) -> ParquetTableWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def write_customers_csv(path: Path, records: Iterable[CustomerRecord]) -> None:
+    with CsvTableWriter(path, CUSTOMER_FIELDS, customer_row) as writer:
+        writer.write(records)
+
+
+def write_proposals_csv(path: Path, records: Iterable[ProposalRecord]) -> None:
+    with CsvTableWriter(path, PROPOSAL_FIELDS, proposal_row) as writer:
+        writer.write(records)
+
+
+def write_revisions_csv(path: Path, records: Iterable[ProposalRevisionRecord]) -> None:
+    with CsvTableWriter(path, REVISION_FIELDS, revision_row) as writer:
+        writer.write(records)
+
+
+def write_customers_binary(path: Path, records: Iterable[CustomerRecord]) -> None:
+    with BinaryCopyWriter(path, CUSTOMER_COLUMN_TYPES, customer_row) as writer:
+        writer.write(records)
+
+
+def write_customers_parquet(path: Path, records: Iterable[CustomerRecord]) -> None:
+    with ParquetTableWriter(path, CUSTOMER_COLUMN_TYPES, customer_row) as writer:
+        writer.write(records)
+
+
+def export_records(
+    tasks: list[SheetTask],
+    proposals_csv: Path,
+    revisions_csv: Path,
+    layouts_file: Path,
+    warnings_file: Path,
+    quarantine_dir: Path,
+    *,
+    workers: int = 1,
+    copy_format: str = "csv",
+    output_format: str = "csv",
+    on_duplicate: str = "first-wins",
+) -> ExtractionTotals:
+    """Streams every sheet's records into the CSV writers, keeping only aggregates.
+
+    Proposals whose code was already extracted are resolved by on_duplicate as they arrive;
+    the discarded ones and their revisions are written to quarantine_dir instead.
+    """
+    xlsx_paths = list(dict.fromkeys(task.xlsx_path for task in tasks))
+    counts_by_path = {xlsx_path: WorkbookCounts(xlsx_path, {}, {}) for xlsx_path in xlsx_paths}
+    totals = ExtractionTotals(workbook_counts=list(counts_by_path.values()))
+    duplicates = DuplicateIndex(on_duplicate)
+    quarantine_dir.mkdir(parents=True, exist_ok=True)
+    quarantine_proposals_csv = quarantine_dir / proposals_csv.name
+    quarantine_revisions_csv = quarantine_dir / revisions_csv.name
+    # Typed copies of the CSVs, written from the same records.
+    derived_outputs: list[tuple[type[BinaryCopyWriter] | type[ParquetTableWriter], str]] = []
+    if copy_format == "binary":
+        derived_outputs.append((BinaryCopyWriter, ".pgcopy"))
+    if output_format == "parquet":
+        derived_outputs.append((ParquetTableWriter, ".parquet"))
+    # Sheet identities only, without the records.
+    manifest: list[tuple[Path, SheetResult]] = []
+    cache = tasks[0].cache if tasks else None
+
+    with ExitStack() as stack:
+        warning_log = stack.enter_context(WarningLog(warnings_file))
+        quarantine = (
+            stack.enter_context(
+                CsvTableWriter(quarantine_proposals_csv, PROPOSAL_FIELDS, proposal_row)
+            ),
+            stack.enter_context(
+                CsvTableWriter(quarantine_revisions_csv, REVISION_FIELDS, revision_row)
+            ),
+        )
+        writers: list[tuple[Any, Any]] = [
+            (
+                stack.enter_context(CsvTableWriter(proposals_csv, PROPOSAL_FIELDS, proposal_row)),
+                stack.enter_context(CsvTableWriter(revisions_csv, REVISION_FIELDS, revision_row)),
+            )
+        ]
+        for writer_class, suffix in derived_outputs:
+            writers.append(
+                (
+                    stack.enter_context(
+                        writer_class(
+                            sibling_output(proposals_csv, suffix), PROPOSAL_COLUMN_TYPES, proposal_row
+                        )
+                    ),
+                    stack.enter_context(
+                        writer_class(
+                            sibling_output(revisions_csv, suffix), REVISION_COLUMN_TYPES, revision_row
+                        )
+                    ),
+                )
+            )
+
+        # Sheet names are only unique within a workbook, so batch runs name the file.
+        multiple_files = len(xlsx_paths) > 1
+        for task, result in extract_records(tasks, workers=workers):
+            with PROFILER.stage("duplicate_index"):
+                admission = duplicates.admit(task.xlsx_path, result)
+            for proposals_writer, revisions_writer in writers:
+                with PROFILER.stage(f"write {proposals_writer.path.name}"):
+                    proposals_writer.write(admission.proposals)
+                with PROFILER.stage(f"write {revisions_writer.path.name}"):
+                    revisions_writer.write(admission.revisions)
+            quarantine[0].write(admission.quarantined_proposals)
+            quarantine[1].write(admission.quarantined_revisions)
+            warning_log.write(result.warnings, task.xlsx_path if multiple_files else None)
+            for event, xlsx_path in admission.events:
+                warning_log.write([event], xlsx_path if multiple_files else None)
+            if result.profile is not None:
+                PROFILER.merge(result.profile.stages)
+                totals.sheet_profiles.append((task, result.profile, result.reused))
+            totals.proposals_total += len(admission.proposals)
+            totals.revisions_total += len(admission.revisions)
+            totals.proposals_by_status.update(proposal.status for proposal in admission.proposals)
+            totals.proposals_by_slug[task.customer_slug] += len(admission.proposals)
+            counts = counts_by_path[task.xlsx_path]
+            counts.proposals_by_sheet[task.sheet] = len(admission.proposals)
+            counts.revisions_by_sheet[task.sheet] = len(admission.revisions)
+            for evicted in admission.evicted:
+                totals.proposals_total -= 1
+                totals.revisions_total -= evicted.revisions
+                totals.proposals_by_status[evicted.status] -= 1
+                totals.proposals_by_slug[evicted.customer_slug] -= 1
+                counts = counts_by_path[evicted.xlsx_path]
+                counts.proposals_by_sheet[evicted.sheet] -= 1
+                counts.revisions_by_sheet[evicted.sheet] -= evicted.revisions
+            manifest.append(
+                (task.xlsx_path, replace(result, proposals=[], revisions=[], warnings=[]))
+            )
+        totals.warnings = warning_log.summary()
+        totals.quarantined = warning_log.counts["duplicate_code"]
+
+    if duplicates.evicted:
+        with PROFILER.stage("compact_outputs"):
+            for csv_path, quarantine_path, code_field, column_types in (
+                (proposals_csv, quarantine_proposals_csv, "code", PROPOSAL_COLUMN_TYPES),
+                (revisions_csv, quarantine_revisions_csv, "proposal_code", REVISION_COLUMN_TYPES),
+            ):
+                compact_table(csv_path, quarantine_path, code_field, duplicates.evicted)
+                for writer_class, suffix in derived_outputs:
+                    rebuild_from_csv(
+                        csv_path, writer_class(sibling_output(csv_path, suffix), column_types, list)
+                    )
+
+    if cache is not None:
+        cache.write_manifest(manifest)
+    with PROFILER.stage("layouts_report"):
+        totals.layouts_total = write_layouts_report(layouts_file, manifest)
+    return totals
+
+
+# Private schema for the tables an import keeps between sessions. Supabase's Data API only
+# exposes public, and nobody but the schema's owner may use it.
+IMPORT_SCHEMA = "legacy_import"
+
+
+def import_schema_sql() -> str:
+    # Concurrent scripts would race on CREATE SCHEMA IF NOT EXISTS; the lock serializes them.
+    return f"""DO $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('{IMPORT_SCHEMA}'));
+  CREATE SCHEMA IF NOT EXISTS {IMPORT_SCHEMA};
+  REVOKE ALL ON SCHEMA {IMPORT_SCHEMA} FROM PUBLIC;
+END
+$$;
+"""
+
+
+def staging_table_sql(
+    name: str, column_types: dict[str, str], *, typed: bool, temporary: bool = True
+) -> str:
+    # CSV staging tables keep everything but integers as text and cast on insert.
+    columns = ",\n".join(
+        f"  {column} {sql_type if typed or sql_type == 'integer' else 'text'}"
+        for column, sql_type in column_types.items()
+    )
+    # Shard tables are filled by other sessions, so they cannot be temporary.
+    kind = "TEMP" if temporary else "UNLOGGED"
+    return f"CREATE {kind} TABLE {name} (\n{columns}\n);"
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    name: str
+    file_name: str
+    fieldnames: list[str]
+    column_types: dict[str, str]
+    key_fields: list[str]
+
+    @property
+    def compared_fields(self) -> list[str]:
+        # Legacy provenance columns are not imported, so a row moving in its sheet is no change;
+        # row_hash is derived from the rest and missing from older outputs.
+        return [
+            name
+            for name in self.fieldnames
+            if not name.startswith("legacy_") and name != "row_hash"
+        ]
+
+
+EXPORT_TABLES = [
+    ExportTable(
+        "customers", "customers_legacy.csv", CUSTOMER_FIELDS, CUSTOMER_COLUMN_TYPES, ["slug"]
+    ),
+    ExportTable(
+        "proposals", "proposals_legacy.csv", PROPOSAL_FIELDS, PROPOSAL_COLUMN_TYPES, ["code"]
+    ),
+    ExportTable(
+        "proposal_revisions",
+        "proposal_revisions_legacy.csv",
+        REVISION_FIELDS,
+        REVISION_COLUMN_TYPES,
+        ["proposal_code", "revision_number"],
+    ),
+]
+DELETED_KEY_FIELDS = ["table_name", "code", "revision_number"]
+
+
+@dataclass
+class TableSnapshot:
+    """Keys and keyed rows of a previous run's CSV.
+
+    Rows are kept as (key, compared values) pairs, since a key may appear more than once
+    when the workbooks hold duplicate codes.
+    """
+
+    keys: set[tuple[str, ...]]
+    rows: set[tuple[tuple[str, ...], tuple[str, ...]]]
+
+
+@dataclass
+class TableDelta:
+    inserted: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    deleted: list[tuple[str, ...]] = field(default_factory=list)
+
+
+def read_table_snapshot(path: Path, table: ExportTable) -> TableSnapshot:
+    with open_output(path) as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        try:
+            key_index = [header.index(name) for name in table.key_fields]
+            value_index = [header.index(name) for name in table.compared_fields]
+        except ValueError:
+            raise SystemExit(f"Unexpected columns in previous output: {path}") from None
+        rows = {
+            (
+                tuple(row[index] for index in key_index),
+                tuple(row[index] for index in value_index),
+            )
+            for row in reader
+        }
+    return TableSnapshot(keys={key for key, _ in rows}, rows=rows)
+
+
+def load_previous_run(previous_dir: Path) -> dict[str, TableSnapshot]:
+    # Read up front, so --since may point at the directory this run overwrites.
+    snapshots: dict[str, TableSnapshot] = {}
+    for table in EXPORT_TABLES:
+        path = find_output(previous_dir / table.file_name)
+        if path is None:
+            raise SystemExit(f"Previous output not found: {previous_dir / table.file_name}")
+        snapshots[table.name] = read_table_snapshot(path, table)
+    return snapshots
+
+
+def write_table_delta(
+    current_csv: Path,
+    delta_csv: Path,
+    table: ExportTable,
+    previous: TableSnapshot,
+    *,
+    copy_format: str,
+) -> TableDelta:
+    delta = TableDelta()
+    seen: set[tuple[str, ...]] = set()
+    key_index = [table.fieldnames.index(name) for name in table.key_fields]
+    value_index = [table.fieldnames.index(name) for name in table.compared_fields]
+
+    with ExitStack() as stack:
+        writers: list[CsvTableWriter | BinaryCopyWriter] = [
+            stack.enter_context(CsvTableWriter(delta_csv, table.fieldnames, list))
+        ]
+        if copy_format == "binary":
+            writers.append(
+                stack.enter_context(
+                    BinaryCopyWriter(sibling_output(delta_csv, ".pgcopy"), table.column_types, list)
+                )
+            )
+
+        with open_output(current_csv) as file:
+            reader = csv.reader(file)
+            next(reader)
+            for row in reader:
+                key = tuple(row[index] for index in key_index)
+                seen.add(key)
+                if key not in previous.keys:
+                    delta.inserted += 1
+                elif (key, tuple(row[index] for index in value_index)) not in previous.rows:
+                    delta.changed += 1
+                else:
+                    delta.unchanged += 1
+                    continue
+                for writer in writers:
+                    writer.write([row])
+
+    delta.deleted = sorted(previous.keys - seen)
+    return delta
+
+
+def write_delta(
+    output_dir: Path,
+    previous_run: dict[str, TableSnapshot],
+    *,
+    copy_format: str,
+    batches: dict[str, int] | None = None,
+    compression: str = "none",
+    publish_dir: Path | None = None,
+) -> dict[str, TableDelta]:
+    """Writes delta/ with the rows that changed since the previous run and its import script.
+
+    Customers are only ever upserted, so their deleted keys are counted but not listed. The
+    script names the delta files under publish_dir when output_dir is published there.
+    """
+    delta_dir = output_dir / "delta"
+    delta_dir.mkdir(exist_ok=True)
+    deltas = {
+        table.name: write_table_delta(
+            compressed_path(output_dir / table.file_name, compression),
+            compressed_path(delta_dir / table.file_name, compression),
+            table,
+            previous_run[table.name],
+            copy_format=copy_format,
+        )
+        for table in EXPORT_TABLES
+    }
+
+    deleted_keys_csv = delta_dir / "deleted_keys.csv"
+    with deleted_keys_csv.open("w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(DELETED_KEY_FIELDS)
+        writer.writerows(("proposals", code, "") for (code,) in deltas["proposals"].deleted)
+        writer.writerows(
+            ("proposal_revisions", code, revision_number)
+            for code, revision_number in deltas["proposal_revisions"].deleted
+        )
+
+    customers_csv, proposals_csv, revisions_csv = (
+        compressed_path(delta_dir / table.file_name, compression) for table in EXPORT_TABLES
+    )
+    write_sql(
+        delta_dir / "import_legacy.sql",
+        customers_csv,
+        proposals_csv,
+        revisions_csv,
+        copy_format=copy_format,
+        deleted_keys_csv=deleted_keys_csv,
+        batches=batches,
+        publish_dir=publish_dir / delta_dir.name if publish_dir is not None else None,
+    )
+    return deltas
+
+
+def deleted_keys_sql(deleted_keys_csv: Path) -> str:
+    # Deletes cascade to attachments and supplier links added in the app, so they are opt-in.
+    return f"""CREATE TEMP TABLE stg_deleted_keys (
+  table_name text,
+  code text,
+  revision_number integer
+);
+
+\\copy stg_deleted_keys FROM '{deleted_keys_csv.as_posix()}' WITH (FORMAT csv, HEADER true, ENCODING 'UTF8');
+
+\\if :{{?apply_deletes}}
+DELETE FROM proposal_revisions pr
+USING proposals p, stg_deleted_keys dk
+WHERE dk.table_name = 'proposal_revisions'
+  AND p.code = dk.code
+  AND pr.proposal_id = p.id
+  AND pr.revision_number = dk.revision_number;
+
+DELETE FROM proposals p
+USING stg_deleted_keys dk
+WHERE dk.table_name = 'proposals'
+  AND p.code = dk.code;
+\\else
+\\echo 'Deleted keys were not applied; rerun with -v apply_deletes=1 to delete them.'
+\\endif
+
+"""
+
+
+def plan_sql_batches(
+    customers: list[CustomerRecord],
+    proposals_by_slug: Counter[str],
+    batch_size: int,
+) -> dict[str, int]:
+    """Groups whole customers, in order, into batches of at most batch_size proposals.
+
+    A customer with more proposals than batch_size gets a batch of its own.
+    """
+    batches: dict[str, int] = {}
+    batch = 1
+    size = 0
+    for customer in customers:
+        count = proposals_by_slug[customer.slug]
+        if size and size + count > batch_size:
+            batch += 1
+            size = 0
+        batches[customer.slug] = batch
+        size += count
+    return batches
+
+
+def import_run_id(sources: list[Path], batches: dict[str, int]) -> str:
+    """Identifies a batched import by the data it loads and how it is split."""
+    digest = hashlib.sha256(json.dumps(sorted(batches.items())).encode("utf-8"))
+    for source in sources:
+        with source.open("rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def copy_source_sql(path: Path) -> str:
+    """Source of a psql \\copy; compressed files are streamed through their decompressor."""
+    program = DECOMPRESS_PROGRAMS.get(compression_suffix(path))
+    if program is None:
+        return f"'{path.as_posix()}'"
+    return f"""PROGRAM '{program} "{path.as_posix()}"'"""
+
+
+def shard_table_name(table: str, shard: int) -> str:
+    return f"{IMPORT_SCHEMA}.stg_{table}_{shard:02d}"
+
+
+def write_sql(
+    path: Path,
+    customers_csv: Path,
+    proposals_csv: Path,
+    revisions_csv: Path,
+    *,
+    copy_format: str = "csv",
+    deleted_keys_csv: Path | None = None,
+    batches: dict[str, int] | None = None,
+    shards: int = 0,
+    publish_dir: Path | None = None,
+) -> None:
+    """Writes the psql import script.
+
+    By default the whole import runs in one transaction. With batches (customer slug to batch
+    number), every batch commits on its own and is recorded in legacy_import.batches, so
+    rerunning the same script skips the batches that already committed. With shards, one
+    load script per shard of proposals and revisions is written next to path, and path
+    merges the shard tables they fill and runs the upserts. When the files are moved to
+    publish_dir afterwards, the scripts name them there.
+    """
+
+    def published(file: Path) -> Path:
+        return publish_dir / file.relative_to(path.parent) if publish_dir is not None else file
+
+    binary = copy_format == "binary"
+    deletions = (
+        deleted_keys_sql(published(deleted_keys_csv)) if deleted_keys_csv is not None else ""
+    )
+    sources = [customers_csv, proposals_csv, revisions_csv]
+    copy_options = "FORMAT csv, HEADER true, ENCODING 'UTF8'"
+    if binary:
+        sources = [sibling_output(csv_path, ".pgcopy") for csv_path in sources]
+        copy_options = "FORMAT binary"
+    customers_source, proposals_source, revisions_source = (
+        copy_source_sql(published(source)) for source in sources
+    )
+
+    def typed(column: str, sql_type: str) -> str:
+        # Binary COPY already loaded the value with its type, NULLs included.
+        return column if binary else f"NULLIF({column}, '')::{sql_type}"
+
+    header = """\\set ON_ERROR_STOP on
+\\if :{?created_by}
+\\else
+\\echo 'Required parameter: -v created_by=<UUID>'
+\\quit 1
+\\endif
+
+"""
+
+    def load(prefix: str) -> str:
+        return f"""{staging_table_sql(f"{prefix}_customers", CUSTOMER_COLUMN_TYPES, typed=binary)}
+
+{staging_table_sql(f"{prefix}_proposals", PROPOSAL_COLUMN_TYPES, typed=binary)}
+
+{staging_table_sql(f"{prefix}_proposal_revisions", REVISION_COLUMN_TYPES, typed=binary)}
+
+\\copy {prefix}_customers FROM {customers_source} WITH ({copy_options});
+\\copy {prefix}_proposals FROM {proposals_source} WITH ({copy_options});
+\\copy {prefix}_proposal_revisions FROM {revisions_source} WITH ({copy_options});
+
+"""
+
+    stage_indexes = """-- Temp tables are never analyzed by autovacuum; without statistics every join is a guess.
+CREATE INDEX ON stg_customers (slug);
+CREATE INDEX ON stg_proposals (code);
+CREATE INDEX ON stg_proposals (customer_slug);
+CREATE INDEX ON stg_proposal_revisions (proposal_code, revision_number);
+"""
+    customers_upsert = """INSERT INTO customers (name, slug, cnpj, notes, status)
+SELECT
+  sc.name,
+  sc.slug,
+  NULLIF(sc.cnpj, ''),
   NULLIF(sc.notes, ''),
   sc.status::customer_status
 FROM stg_customers sc
@@ -771,9 +3413,14 @@ SET
   cnpj = COALESCE(NULLIF(EXCLUDED.cnpj, ''), customers.cnpj),
   notes = COALESCE(NULLIF(EXCLUDED.notes, ''), customers.notes),
   status = EXCLUDED.status,
-  updated_at = NOW();
+  updated_at = NOW()
+WHERE customers.name IS DISTINCT FROM EXCLUDED.name
+  OR customers.status IS DISTINCT FROM EXCLUDED.status
+  OR (NULLIF(EXCLUDED.cnpj, '') IS NOT NULL AND customers.cnpj IS DISTINCT FROM EXCLUDED.cnpj)
+  OR (NULLIF(EXCLUDED.notes, '') IS NOT NULL AND customers.notes IS DISTINCT FROM EXCLUDED.notes);
 
-INSERT INTO proposals (
+"""
+    proposals_upsert = f"""INSERT INTO proposals (
   customer_id,
   code,
   seq_number,
@@ -800,14 +3447,22 @@ SELECT
   sp.scope_description,
   sp.status::proposal_status,
   NULL,
-  NULLIF(sp.estimated_value_brl, '')::numeric(14, 2),
-  NULLIF(sp.final_value_brl, '')::numeric(14, 2),
+  {typed("sp.estimated_value_brl", "numeric(14, 2)")},
+  {typed("sp.final_value_brl", "numeric(14, 2)")},
   NULLIF(sp.outcome_reason, ''),
   :'created_by'::uuid,
-  NULLIF(sp.created_at, '')::timestamptz,
-  NULLIF(sp.updated_at, '')::timestamptz
+  {typed("sp.created_at", "timestamptz")},
+  {typed("sp.updated_at", "timestamptz")}
 FROM stg_proposals sp
 JOIN customers c ON c.slug = sp.customer_slug
+WHERE NOT EXISTS (
+  SELECT 1
+  FROM proposals stored
+  WHERE stored.code = sp.code
+    AND stored.customer_id = c.id
+    AND stored.due_date IS NULL
+    AND {row_hash_sql(PROPOSAL_HASH_SQL, "stored")} = sp.row_hash
+)
 ON CONFLICT (code) DO UPDATE
 SET
   customer_id = EXCLUDED.customer_id,
@@ -824,7 +3479,8 @@ SET
   created_at = EXCLUDED.created_at,
   updated_at = EXCLUDED.updated_at;
 
-INSERT INTO proposal_revisions (
+"""
+    revisions_upsert = f"""INSERT INTO proposal_revisions (
   proposal_id,
   revision_number,
   reason,
@@ -842,15 +3498,23 @@ SELECT
   sr.revision_number,
   NULLIF(sr.reason, ''),
   NULLIF(sr.scope_changes, ''),
-  NULLIF(sr.discount_brl, '')::numeric(14, 2),
-  NULLIF(sr.discount_percent, '')::numeric(5, 2),
-  NULLIF(sr.value_before_brl, '')::numeric(14, 2),
-  NULLIF(sr.value_after_brl, '')::numeric(14, 2),
+  {typed("sr.discount_brl", "numeric(14, 2)")},
+  {typed("sr.discount_percent", "numeric(5, 2)")},
+  {typed("sr.value_before_brl", "numeric(14, 2)")},
+  {typed("sr.value_after_brl", "numeric(14, 2)")},
   NULLIF(sr.notes, ''),
   :'created_by'::uuid,
-  NULLIF(sr.created_at, '')::timestamptz
+  {typed("sr.created_at", "timestamptz")}
 FROM stg_proposal_revisions sr
 JOIN proposals p ON p.code = sr.proposal_code
+WHERE NOT EXISTS (
+  SELECT 1
+  FROM proposal_revisions stored
+  WHERE stored.proposal_id = p.id
+    AND stored.revision_number = sr.revision_number
+    AND stored.created_by = :'created_by'::uuid
+    AND {row_hash_sql(REVISION_HASH_SQL, "stored")} = sr.row_hash
+)
 ON CONFLICT (proposal_id, revision_number) DO UPDATE
 SET
   reason = EXCLUDED.reason,
@@ -863,10 +3527,15 @@ SET
   created_by = EXCLUDED.created_by,
   created_at = EXCLUDED.created_at;
 
-WITH imported_customers AS (
+"""
+    sequences_upsert = """WITH imported_customers AS (
   SELECT c.id
   FROM customers c
-  JOIN stg_customers sc ON sc.slug = c.slug
+  WHERE c.slug IN (
+    SELECT sc.slug FROM stg_customers sc
+    UNION
+    SELECT sp.customer_slug FROM stg_proposals sp
+  )
 ),
 next_seq AS (
   SELECT
@@ -882,89 +3551,631 @@ FROM next_seq ns
 ON CONFLICT (customer_id) DO UPDATE
 SET
   next_seq = GREATEST(proposal_sequences.next_seq, EXCLUDED.next_seq),
-  updated_at = NOW();
+  updated_at = NOW()
+WHERE proposal_sequences.next_seq < EXCLUDED.next_seq;
+
+"""
+
+    if shards:
+        shard_runs = "\n".join(
+            f"--   psql -f '{published(shard_path(path, shard)).as_posix()}' &"
+            for shard in range(1, shards + 1)
+        )
+        sql = f"""{header}-- Load every shard first; the scripts can run concurrently:
+{shard_runs}
+--   wait
+BEGIN;
+
+{staging_table_sql("stg_customers", CUSTOMER_COLUMN_TYPES, typed=binary)}
+
+\\copy stg_customers FROM {customers_source} WITH ({copy_options});
+
+CREATE INDEX ON stg_customers (slug);
+ANALYZE stg_customers;
+
+"""
+        for table in ("proposals", "proposal_revisions"):
+            union = "\nUNION ALL\n".join(
+                f"SELECT * FROM {shard_table_name(table, shard)}"
+                for shard in range(1, shards + 1)
+            )
+            sql += f"CREATE TEMP VIEW stg_{table} AS\n{union};\n\n"
+        shard_tables = ", ".join(
+            shard_table_name(table, shard)
+            for shard in range(1, shards + 1)
+            for table in ("proposals", "proposal_revisions")
+        )
+        # The views depend on the shard tables, so they go first; dropping both before COMMIT
+        # leaves no shard data behind once the merge is in.
+        sql += customers_upsert + proposals_upsert + revisions_upsert + deletions + sequences_upsert
+        sql += f"""DROP VIEW stg_proposals, stg_proposal_revisions;
+DROP TABLE {shard_tables};
+
+COMMIT;
+"""
+        for shard in range(1, shards + 1):
+            proposals_table = shard_table_name("proposals", shard)
+            revisions_table = shard_table_name("proposal_revisions", shard)
+            shard_sources = [
+                copy_source_sql(published(shard_path(source, shard))) for source in sources[1:]
+            ]
+            shard_path(path, shard).write_text(
+                f"""\\set ON_ERROR_STOP on
+-- Shard {shard} of {shards}; {path.name} merges every shard once all are loaded.
+{import_schema_sql()}
+DROP TABLE IF EXISTS {proposals_table}, {revisions_table};
+
+{staging_table_sql(proposals_table, PROPOSAL_COLUMN_TYPES, typed=binary, temporary=False)}
+
+{staging_table_sql(revisions_table, REVISION_COLUMN_TYPES, typed=binary, temporary=False)}
+
+\\copy {proposals_table} FROM {shard_sources[0]} WITH ({copy_options});
+\\copy {revisions_table} FROM {shard_sources[1]} WITH ({copy_options});
+
+CREATE INDEX ON {proposals_table} (code);
+CREATE INDEX ON {proposals_table} (customer_slug);
+CREATE INDEX ON {revisions_table} (proposal_code, revision_number);
+ANALYZE {proposals_table};
+ANALYZE {revisions_table};
+""",
+                encoding="utf-8",
+            )
+    elif not batches:
+        sql = f"""{header}BEGIN;
+
+{load("stg")}{stage_indexes}ANALYZE stg_customers;
+ANALYZE stg_proposals;
+ANALYZE stg_proposal_revisions;
+
+{customers_upsert}{proposals_upsert}{revisions_upsert}{deletions}{sequences_upsert}COMMIT;
+"""
+    else:
+        run_id = import_run_id(sources, batches)
+        batch_count = max(batches.values(), default=0)
+        batch_rows = ",\n".join(
+            f"  ('{slug.replace(chr(39), chr(39) * 2)}', {batch})" for slug, batch in batches.items()
+        )
+        sql = f"""{header}{load("src")}CREATE INDEX ON src_customers (slug);
+CREATE INDEX ON src_proposals (customer_slug);
+CREATE INDEX ON src_proposal_revisions (proposal_code);
+ANALYZE src_customers;
+ANALYZE src_proposals;
+ANALYZE src_proposal_revisions;
+
+-- Each batch copies its customers' rows from src_* into the stg_* tables the upserts read.
+CREATE TEMP TABLE stg_customers (LIKE src_customers);
+CREATE TEMP TABLE stg_proposals (LIKE src_proposals);
+CREATE TEMP TABLE stg_proposal_revisions (LIKE src_proposal_revisions);
+
+{stage_indexes}
+CREATE TEMP TABLE stg_batches (
+  customer_slug text PRIMARY KEY,
+  batch integer NOT NULL
+);
+
+INSERT INTO stg_batches (customer_slug, batch) VALUES
+{batch_rows};
+
+-- Committed batches of each generated script, so a rerun resumes after the last one.
+{import_schema_sql()}
+CREATE TABLE IF NOT EXISTS {IMPORT_SCHEMA}.batches (
+  run_id text NOT NULL,
+  batch integer NOT NULL,
+  committed_at timestamptz NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (run_id, batch)
+);
+
+"""
+        for batch in range(1, batch_count + 1):
+            sql += f"""-- Batch {batch} of {batch_count}
+SELECT EXISTS (
+  SELECT 1 FROM {IMPORT_SCHEMA}.batches WHERE run_id = '{run_id}' AND batch = {batch}
+) AS batch_done \\gset
+\\if :batch_done
+\\echo 'Batch {batch} of {batch_count} was already committed; skipping.'
+\\else
+BEGIN;
+
+TRUNCATE stg_customers, stg_proposals, stg_proposal_revisions;
+
+INSERT INTO stg_customers
+SELECT s.*
+FROM src_customers s
+JOIN stg_batches b ON b.customer_slug = s.slug
+WHERE b.batch = {batch};
+
+INSERT INTO stg_proposals
+SELECT s.*
+FROM src_proposals s
+JOIN stg_batches b ON b.customer_slug = s.customer_slug
+WHERE b.batch = {batch};
+
+ANALYZE stg_customers;
+ANALYZE stg_proposals;
+
+{customers_upsert}{proposals_upsert}-- Revisions follow their proposal's customer, which the upsert above just settled.
+INSERT INTO stg_proposal_revisions
+SELECT s.*
+FROM src_proposal_revisions s
+JOIN proposals p ON p.code = s.proposal_code
+JOIN customers c ON c.id = p.customer_id
+JOIN stg_batches b ON b.customer_slug = c.slug
+WHERE b.batch = {batch};
+
+ANALYZE stg_proposal_revisions;
+
+{revisions_upsert}{sequences_upsert}INSERT INTO {IMPORT_SCHEMA}.batches (run_id, batch)
+VALUES ('{run_id}', {batch});
 
 COMMIT;
+\\endif
+
 """
+        if deletions:
+            sql += f"BEGIN;\n\n{deletions}COMMIT;\n"
     path.write_text(sql, encoding="utf-8")
 
 
+def peak_rss_mb() -> tuple[float, float] | None:
+    """Peak resident set size of this process and of its largest worker, in MiB."""
+    try:
+        import resource
+    except ModuleNotFoundError:  # pragma: no cover - not available on Windows
+        return None
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return own, workers
+
+
+def workers_cpu_seconds() -> float | None:
+    try:
+        import resource
+    except ModuleNotFoundError:  # pragma: no cover
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def profile_metrics(
+    totals: ExtractionTotals,
+    started: tuple[float, float],
+    profile_dump: Path | None,
+) -> dict[str, object]:
+    """Builds the summary's metrics block from PROFILER and the per-sheet profiles.
+
+    With --workers, sheet stages run in parallel and their times add up across processes,
+    so the stage totals may exceed the run's wall time.
+    """
+    metrics: dict[str, object] = {
+        "wall_seconds": round(time.perf_counter() - started[0], 4),
+        "cpu_seconds": round(time.process_time() - started[1], 4),
+    }
+    cpu_in_workers = workers_cpu_seconds()
+    if cpu_in_workers:
+        metrics["workers_cpu_seconds"] = round(cpu_in_workers, 4)
+    rss = peak_rss_mb()
+    if rss is not None:
+        metrics["peak_rss_mb"] = round(rss[0], 1)
+        if rss[1]:
+            metrics["workers_peak_rss_mb"] = round(rss[1], 1)
+    metrics["stages"] = {
+        name: {"wall_seconds": round(wall, 4), "cpu_seconds": round(cpu, 4)}
+        for name, (wall, cpu) in sorted(PROFILER.stages.items(), key=lambda item: -item[1][0])
+    }
+    metrics["sheets"] = [
+        {
+            "input_file": task.xlsx_path.as_posix(),
+            "sheet": task.sheet,
+            "rows": profile.rows,
+            "wall_seconds": round(profile.wall_seconds, 4),
+            "rows_per_second": round(profile.rows / profile.wall_seconds)
+            if profile.wall_seconds
+            else 0,
+            "reused": reused,
+        }
+        for task, profile, reused in totals.sheet_profiles
+    ]
+    if profile_dump is not None:
+        metrics["cprofile_dump"] = profile_dump.as_posix()
+    return metrics
+
+
 def write_summary(
     path: Path,
-    input_path: Path,
+    input_label: str,
     customers: list[CustomerRecord],
-    proposals: list[ProposalRecord],
-    revisions: list[ProposalRevisionRecord],
-    warnings: list[str],
-    proposals_by_sheet: dict[str, int],
-    revisions_by_sheet: dict[str, int],
+    totals: ExtractionTotals,
+    *,
+    since: Path | None = None,
+    deltas: dict[str, TableDelta] | None = None,
+    metrics: dict[str, object] | None = None,
 ) -> None:
-    status_counter = Counter([proposal.status for proposal in proposals])
-    summary = {
-        "input_file": input_path.as_posix(),
+    workbook_counts = totals.workbook_counts
+    summary: dict[str, object] = {
+        "input_file": input_label,
         "generated_at_utc": datetime.now(timezone.utc).isoformat(),
         "customers_total": len(customers),
-        "customers_with_proposals": sum(1 for _, count in proposals_by_sheet.items() if count > 0),
-        "proposals_total": len(proposals),
-        "revisions_total": len(revisions),
-        "proposals_by_status": dict(status_counter),
-        "proposals_by_customer": proposals_by_sheet,
-        "revisions_by_customer": revisions_by_sheet,
-        "warnings": warnings,
+        "customers_with_proposals": sum(
+            1
+            for counts in workbook_counts
+            for _, count in counts.proposals_by_sheet.items()
+            if count > 0
+        ),
+        "proposals_total": totals.proposals_total,
+        "revisions_total": totals.revisions_total,
+        "proposals_by_status": dict(totals.proposals_by_status),
     }
+    # Sheet names are only unique within a workbook, so batch runs report them per file.
+    if len(workbook_counts) == 1:
+        summary["proposals_by_customer"] = workbook_counts[0].proposals_by_sheet
+        summary["revisions_by_customer"] = workbook_counts[0].revisions_by_sheet
+    summary["files"] = [
+        {
+            "input_file": counts.input_path.as_posix(),
+            "customers_total": len(counts.proposals_by_sheet),
+            "proposals_total": sum(counts.proposals_by_sheet.values()),
+            "revisions_total": sum(counts.revisions_by_sheet.values()),
+            "proposals_by_customer": counts.proposals_by_sheet,
+            "revisions_by_customer": counts.revisions_by_sheet,
+        }
+        for counts in workbook_counts
+    ]
+    if since is not None and deltas is not None:
+        summary["delta"] = {
+            "since": since.as_posix(),
+            **{
+                name: {
+                    "inserted": delta.inserted,
+                    "changed": delta.changed,
+                    "unchanged": delta.unchanged,
+                    "deleted": len(delta.deleted),
+                }
+                for name, delta in deltas.items()
+            },
+        }
+    if metrics is not None:
+        summary["metrics"] = metrics
+    summary["warnings"] = totals.warnings
     path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
-def main() -> None:
-    parser = build_parser()
-    args = parser.parse_args()
-
-    input_path = Path(args.input).expanduser().resolve()
-    output_dir = Path(args.output_dir).expanduser().resolve()
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    if not input_path.exists():
-        raise SystemExit(f"File not found: {input_path}")
-
-    customers_csv = output_dir / "customers_legacy.csv"
-    proposals_csv = output_dir / "proposals_legacy.csv"
-    revisions_csv = output_dir / "proposal_revisions_legacy.csv"
-    sql_file = output_dir / "import_legacy.sql"
-    summary_file = output_dir / "summary.json"
+def publish_outputs(staging_dir: Path, output_dir: Path) -> None:
+    """Moves every file written to staging_dir to the same place under output_dir.
+
+    Each file is replaced in one rename, so readers of output_dir see either the previous
+    version of a file or the new one, never a half-written file.
+    """
+    for path in sorted(staging_dir.rglob("*")):
+        if path.is_file():
+            target = output_dir / path.relative_to(staging_dir)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            path.replace(target)
+
+
+def run_export(
+    args: argparse.Namespace,
+    input_paths: list[Path],
+    output_dir: Path,
+    *,
+    cache: SheetCache | None,
+    previous_run: dict[str, TableSnapshot] | None,
+    profiler: cProfile.Profile | None = None,
+    profile_dump: Path | None = None,
+) -> None:
+    """One full run over input_paths: every output, the SQL scripts and summary.json.
+
+    Everything is written into STAGING_DIR first and published to output_dir together once
+    summary.json is written, so a run that fails leaves the previous outputs as they were.
+    """
+    started = (time.perf_counter(), time.process_time())
+    # Stage times of a previous run in the same process belong to that run.
+    PROFILER.drain()
+    write_dir = output_dir / STAGING_DIR
+    # Files of a run that was killed before it could clean up are not published with this one.
+    shutil.rmtree(write_dir, ignore_errors=True)
+    write_dir.mkdir()
+
+    customers_csv, proposals_csv, revisions_csv = (
+        compressed_path(write_dir / table.file_name, args.compress) for table in EXPORT_TABLES
+    )
+    sql_file = write_dir / "import_legacy.sql"
+    summary_file = write_dir / "summary.json"
+    layouts_file = output_dir / "sheet_mappings.json"
+    warnings_file = write_dir / "warnings.jsonl"
+    quarantine_dir = write_dir / "quarantine"
+    checkpoints = CheckpointStore(output_dir)
+
+    since = Path(args.since).expanduser().resolve() if args.since else None
+
+    checkpoints.start(input_paths, resume=args.resume)
+    SHEET_MAPPINGS.load(layouts_file)
+    with PROFILER.stage("plan_extraction"):
+        customers, tasks = plan_extraction(
+            input_paths,
+            engine=args.engine,
+            cache=cache,
+            checkpoints=checkpoints,
+            profile=PROFILER.enabled,
+        )
 
-    (
-        customers,
-        proposals,
-        revisions,
-        warnings,
-        proposals_by_sheet,
-        revisions_by_sheet,
-    ) = extract_records(input_path)
-
-    write_customers_csv(customers_csv, customers)
-    write_proposals_csv(proposals_csv, proposals)
-    write_revisions_csv(revisions_csv, revisions)
-    write_sql(sql_file, customers_csv, proposals_csv, revisions_csv)
+    with PROFILER.stage(f"write {customers_csv.name}"):
+        write_customers_csv(customers_csv, customers)
+    if args.copy_format == "binary":
+        customers_binary = sibling_output(customers_csv, ".pgcopy")
+        with PROFILER.stage(f"write {customers_binary.name}"):
+            write_customers_binary(customers_binary, customers)
+    if args.format == "parquet":
+        customers_parquet = sibling_output(customers_csv, ".parquet")
+        with PROFILER.stage(f"write {customers_parquet.name}"):
+            write_customers_parquet(customers_parquet, customers)
+    try:
+        totals = export_records(
+            tasks,
+            proposals_csv,
+            revisions_csv,
+            write_dir / layouts_file.name,
+            warnings_file,
+            quarantine_dir,
+            workers=args.workers,
+            copy_format=args.copy_format,
+            output_format=args.format,
+            on_duplicate=args.on_duplicate,
+        )
+    except DuplicateCodeError as exc:
+        # The inputs were rejected, so nothing of the run is published or left to resume.
+        shutil.rmtree(write_dir)
+        checkpoints.clear()
+        raise SystemExit(str(exc)) from None
+    if args.shards:
+        with PROFILER.stage("shard_outputs"):
+            for csv_path, code_field, column_types in (
+                (proposals_csv, "code", PROPOSAL_COLUMN_TYPES),
+                (revisions_csv, "proposal_code", REVISION_COLUMN_TYPES),
+            ):
+                shard_table(
+                    csv_path,
+                    code_field,
+                    column_types,
+                    args.shards,
+                    binary=args.copy_format == "binary",
+                )
+    batches = (
+        plan_sql_batches(customers, totals.proposals_by_slug, args.sql_batch_size)
+        if args.sql_batch_size
+        else None
+    )
+    with PROFILER.stage("write_sql"):
+        write_sql(
+            sql_file,
+            customers_csv,
+            proposals_csv,
+            revisions_csv,
+            copy_format=args.copy_format,
+            batches=batches,
+            shards=args.shards,
+            publish_dir=output_dir,
+        )
+    with PROFILER.stage("delta"):
+        deltas = (
+            write_delta(
+                write_dir,
+                previous_run,
+                copy_format=args.copy_format,
+                batches=batches,
+                compression=args.compress,
+                publish_dir=output_dir,
+            )
+            if previous_run is not None
+            else None
+        )
+    input_label = (
+        input_paths[0].as_posix()
+        if len(input_paths) == 1
+        else Path(args.input).expanduser().as_posix()
+    )
+    if profiler is not None:
+        # The profiler only exists when a dump path was given.
+        assert profile_dump is not None
+        profiler.disable()
+        profiler.dump_stats(profile_dump)
     write_summary(
         summary_file,
-        input_path,
+        input_label,
         customers,
-        proposals,
-        revisions,
-        warnings,
-        proposals_by_sheet,
-        revisions_by_sheet,
+        totals,
+        since=since,
+        deltas=deltas,
+        metrics=profile_metrics(totals, started, profile_dump) if PROFILER.enabled else None,
+    )
+
+    # Shards of an earlier run may outnumber this run's, so none of them is kept.
+    for path in (proposals_csv, revisions_csv, sql_file):
+        remove_shards(output_dir / path.name)
+        remove_shards(output_dir / sibling_output(path, ".pgcopy").name)
+    # Nor the outputs of an earlier run with another --compress, which --since could pick up.
+    for path in (customers_csv, proposals_csv, revisions_csv):
+        for output in (path, sibling_output(path, ".pgcopy")):
+            base = output_dir / uncompressed_path(output).name
+            for compression in COMPRESSIONS:
+                if compression != args.compress:
+                    compressed_path(base, compression).unlink(missing_ok=True)
+    publish_outputs(write_dir, output_dir)
+    shutil.rmtree(write_dir)
+    customers_csv, proposals_csv, revisions_csv, sql_file, summary_file, warnings_file = (
+        output_dir / path.name
+        for path in (
+            customers_csv,
+            proposals_csv,
+            revisions_csv,
+            sql_file,
+            summary_file,
+            warnings_file,
+        )
     )
+    quarantine_dir = output_dir / quarantine_dir.name
+
+    # Every output is written, so there is nothing left to resume.
+    checkpoints.clear()
 
-    print(f"OK: {input_path}")
+    for input_path in input_paths:
+        print(f"OK: {input_path}")
     print(f"- customers: {customers_csv}")
     print(f"- proposals: {proposals_csv}")
     print(f"- revisions: {revisions_csv}")
     print(f"- sql: {sql_file}")
+    if args.shards:
+        print(f"- shards: {args.shards} load scripts next to {sql_file.name}, run them first")
     print(f"- summary: {summary_file}")
+    print(f"- layouts: {layouts_file} ({totals.layouts_total} distinct)")
+    print(f"- warnings: {warnings_file} ({totals.warnings['total']})")
+    print(
+        f"- quarantine: {quarantine_dir} ({totals.quarantined} duplicate proposals, "
+        f"{args.on_duplicate})"
+    )
     print(f"- total customers: {len(customers)}")
-    print(f"- total proposals: {len(proposals)}")
-    print(f"- total revisions: {len(revisions)}")
+    print(f"- total proposals: {totals.proposals_total}")
+    print(f"- total revisions: {totals.revisions_total}")
+    if PROFILER.enabled:
+        print(f"- metrics: {summary_file} (metrics)")
+    if profile_dump is not None:
+        print(f"- cProfile stats: {profile_dump}")
+    if deltas is not None:
+        print(f"- delta since {since}: {output_dir / 'delta'}")
+        for name, delta in deltas.items():
+            print(
+                f"  - {name}: {delta.inserted} inserted, {delta.changed} changed, "
+                f"{len(delta.deleted)} deleted"
+            )
+
+
+def input_state(input_paths: Sequence[Path]) -> list[tuple[str, int, int]]:
+    return [
+        (path.as_posix(), path.stat().st_size, path.stat().st_mtime_ns)
+        for input_path in input_paths
+        for path in input_files(input_path)
+    ]
+
+
+def watch_inputs(
+    args: argparse.Namespace,
+    output_dir: Path,
+    *,
+    cache: SheetCache,
+    previous_run: dict[str, TableSnapshot] | None,
+) -> None:
+    """Polls the inputs and runs the export again whenever they change, until interrupted.
+
+    A change is acted on once the inputs look the same for a whole interval, so a workbook
+    still being saved is not read half-written. Failed runs are reported and the previous
+    outputs stay in place.
+    """
+    state: list[tuple[str, int, int]] | None = None
+    changed = False
+    print(f"Watching {args.input} every {args.watch_interval:g}s (Ctrl+C to stop)")
+    try:
+        while True:
+            try:
+                input_paths = resolve_input_paths(args.input, engine=args.engine)
+                current = input_state(input_paths)
+            except (OSError, SystemExit):
+                # Editors replace the file on save, so it may be missing for a moment.
+                current = None
+            if state is None:
+                state = current
+            elif current != state:
+                state = current
+                changed = True
+            elif changed and current is not None:
+                changed = False
+                run_started = time.perf_counter()
+                try:
+                    run_export(
+                        args,
+                        input_paths,
+                        output_dir,
+                        cache=cache,
+                        previous_run=previous_run,
+                    )
+                except (Exception, SystemExit) as exc:
+                    # Whatever a half-saved input breaks, the watcher outlives it; the
+                    # partial files of the failed run are dropped with the staging directory,
+                    # and its checkpoints too, so a later --resume cannot pick them up.
+                    shutil.rmtree(output_dir / STAGING_DIR, ignore_errors=True)
+                    CheckpointStore(output_dir).clear()
+                    print(f"Run failed, outputs left as they were: {exc}", file=sys.stderr)
+                else:
+                    print(f"Re-emitted in {time.perf_counter() - run_started:.2f}s")
+            time.sleep(args.watch_interval)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+
+def main() -> None:
+    parser = build_parser()
+    args = parser.parse_args()
+    profile_dump = Path(args.profile_dump).expanduser().resolve() if args.profile_dump else None
+    PROFILER.enabled = args.profile or profile_dump is not None
+    profiler = cProfile.Profile() if profile_dump is not None else None
+    if profiler is not None:
+        profiler.enable()
+
+    input_paths = resolve_input_paths(args.input, engine=args.engine)
+    if args.validate_only:
+        _, tasks = plan_extraction(input_paths, engine=args.engine)
+        report = validate_records(tasks)
+        for input_path in input_paths:
+            print(f"CHECKED: {input_path}")
+        print_validation_report(report)
+        if report.duplicates and args.on_duplicate == "fail-fast":
+            raise SystemExit(f"{len(report.duplicates)} duplicate proposal codes found")
+        return
+
+    output_dir = Path(args.output_dir).expanduser().resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.workers < 1:
+        raise SystemExit("--workers must be at least 1")
+    if args.sql_batch_size < 0:
+        raise SystemExit("--sql-batch-size must not be negative")
+    if args.shards < 0:
+        raise SystemExit("--shards must not be negative")
+    if args.shards and args.sql_batch_size:
+        raise SystemExit("--shards cannot be combined with --sql-batch-size")
+    if args.watch_interval <= 0:
+        raise SystemExit("--watch-interval must be positive")
+    if args.watch and args.resume:
+        raise SystemExit("--watch cannot be combined with --resume")
+
+    if args.compress == "zstd":
+        import_zstandard()
+
+    since = Path(args.since).expanduser().resolve() if args.since else None
+    previous_run = load_previous_run(since) if since is not None else None
+    cache = None
+    if args.incremental or args.watch:
+        # Pool workers get pickled copies of the cache, so only a single process keeps
+        # records in memory between watch runs.
+        memory: dict[str, SheetResult] | None = {} if args.watch and args.workers == 1 else None
+        cache = SheetCache(output_dir, memory)
+
+    try:
+        run_export(
+            args,
+            input_paths,
+            output_dir,
+            cache=cache,
+            previous_run=previous_run,
+            profiler=profiler,
+            profile_dump=profile_dump,
+        )
+    except BaseException:
+        # The published outputs are untouched; only the staged files of the failed run go.
+        shutil.rmtree(output_dir / STAGING_DIR, ignore_errors=True)
+        raise
+    if args.watch:
+        watch_inputs(args, output_dir, cache=cache, previous_run=previous_run)  # type: ignore[arg-type]
 
 
 if __name__ == "__main__":